@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Santa Tracker server.
+
+Starts ``bench/stub_ollama.py`` and ``server.py`` (pointed at the stub through
+a temporary config passed in ``SANTA_CONFIG_FILE``), drives a weighted mix of
+static, config, models and generate traffic (or replays a ``requests.jsonl``
+capture from the request log) and prints a JSON report with throughput and
+p50/p95/p99 latency per endpoint.
+
+    python3 bench/run_bench.py --duration 30 --concurrency 16
+    python3 bench/run_bench.py --mix generate=1,generate_stream=1 --stub-latency 0.5
+    python3 bench/run_bench.py --replay ~/.santa-tracker/logs/requests.jsonl --output bench/results.json
+    python3 bench/run_bench.py --set server.maxConcurrency=4 --compare bench/results.json
+    python3 bench/run_bench.py --stubs 3 --mix generate=1   # route across three backends
+"""
+
+import argparse
+import copy
+import http.client
+import json
+import math
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+REPO_DIR = BENCH_DIR.parent
+DEFAULT_MIX = "static=30,config=15,models=15,generate=25,generate_stream=10,generate_cached=5"
+STATIC_PATHS = ('/', '/santa-tracker.html', '/js/LanguageManager.js', '/js/SoundManager.js', '/favicon.ico')
+PROMPTS = (
+    "You are Santa Claus! Write a cheerful message about preparing for Christmas Eve.",
+    "You are Santa Claus! Write a cheerful message to someone tracking your journey.",
+    "You are Santa Claus! Write a cheerful message about resting at the North Pole."
+)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def set_path(config, dotted, value):
+    """Set ``a.b.c`` in a nested dict, creating sections as needed"""
+    keys = dotted.split('.')
+    node = config
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+def normalize_model(name):
+    return name if ':' in name else f'{name}:latest'
+
+
+class Scenario:
+    """Builds the requests for one named traffic type"""
+
+    def __init__(self, model):
+        self.model = model
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def nonce(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def build(self, name):
+        """Return (label, method, path, body) for a scenario name"""
+        if name == 'static':
+            return name, 'GET', random.choice(STATIC_PATHS), None
+        if name == 'config':
+            return name, 'GET', '/api/config', None
+        if name == 'models':
+            return name, 'GET', '/api/models', None
+        if name in ('generate', 'generate_stream'):
+            body = {
+                "model": self.model,
+                "prompt": f"{random.choice(PROMPTS)} (visitor #{self.nonce()})",
+                "stream": name == 'generate_stream',
+                "options": {"temperature": 0.8, "num_predict": 150}
+            }
+            return name, 'POST', '/api/generate', body
+        if name == 'generate_cached':
+            body = {"model": self.model, "prompt": random.choice(PROMPTS), "stream": False,
+                    "options": {"temperature": 0, "num_predict": 150}}
+            return name, 'POST', '/api/generate', body
+        raise ValueError(f"Unknown scenario: {name}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def load_replay(path, default_model):
+    """Turn request-log records into (label, method, path, body) tuples"""
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or not str(record.get('path', '')).startswith('/'):
+                continue
+            method = record.get('method', 'POST')
+            body = None
+            if method in ('POST', 'PUT'):
+                prompt = record.get('prompt')
+                if prompt is None:
+                    # Text was sampled out of the log; keep the size realistic
+                    prompt = ('Ho ho ho ' * (record.get('prompt_chars', 80) // 9 + 1))[:record.get('prompt_chars', 80)]
+                body = {"model": record.get('model') or default_model, "prompt": prompt,
+                        "stream": bool(record.get('stream'))}
+                if record.get('options'):
+                    body["options"] = record['options']
+            label = f"{method} {urllib.parse.urlsplit(record['path']).path}" + (' (stream)' if body and body['stream'] else '')
+            requests.append((label, method, record['path'], body))
+    if not requests:
+        raise SystemExit(f"No replayable records in {path}")
+    return requests
+
+
+class LoadGenerator:
+    """Runs worker threads with keep-alive connections and collects samples"""
+
+    def __init__(self, host, port, next_request, concurrency, timeout):
+        self.host = host
+        self.port = port
+        self.next_request = next_request
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def run(self, warmup, duration):
+        measure_from = time.monotonic() + warmup
+        deadline = measure_from + duration
+        threads = [threading.Thread(target=self.worker, args=(measure_from, deadline), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.timeout + duration + warmup)
+        return measure_from, deadline
+
+    def worker(self, measure_from, deadline):
+        conn = None
+        samples = []
+        while time.monotonic() < deadline:
+            label, method, path, body = self.next_request()
+            if conn is None:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            data = json.dumps(body).encode('utf-8') if body is not None else None
+            headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, br'} if data else {'Accept-Encoding': 'gzip, br'}
+            started = time.monotonic()
+            ttfb = None
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                if body is not None and body.get('stream'):
+                    response.readline()
+                    ttfb = time.monotonic() - started
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                status = 0
+                if conn is not None:
+                    conn.close()
+                conn = None
+            finished = time.monotonic()
+            if started >= measure_from and finished <= deadline + self.timeout:
+                samples.append((label, status, finished - started, ttfb, finished))
+        if conn is not None:
+            conn.close()
+        with self.lock:
+            self.samples.extend(samples)
+
+
+def summarize(samples, measured_seconds):
+    endpoints = {}
+    for label, status, latency, ttfb, _ in samples:
+        entry = endpoints.setdefault(label, {"latencies": [], "ttfbs": [], "statuses": {}})
+        entry["latencies"].append(latency)
+        if ttfb is not None:
+            entry["ttfbs"].append(ttfb)
+        entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+
+    report = {}
+    for label, entry in sorted(endpoints.items()):
+        latencies = sorted(entry["latencies"])
+        errors = sum(n for status, n in entry["statuses"].items() if status == '0' or int(status) >= 400)
+        stats = {
+            "requests": len(latencies),
+            "errors": errors,
+            "statuses": entry["statuses"],
+            "throughput_rps": round(len(latencies) / measured_seconds, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2)
+        }
+        if entry["ttfbs"]:
+            ttfbs = sorted(entry["ttfbs"])
+            stats["ttfb_p50_ms"] = round(percentile(ttfbs, 0.50) * 1000, 2)
+            stats["ttfb_p95_ms"] = round(percentile(ttfbs, 0.95) * 1000, 2)
+        report[label] = stats
+    return report
+
+
+def compare(report, baseline_path):
+    """Print throughput and p95 changes against an earlier report to stderr"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {baseline_path}:", file=sys.stderr)
+    print(f"  {'endpoint':<28}{'rps':>10}{'Δ rps':>10}{'p95 ms':>10}{'Δ p95':>10}", file=sys.stderr)
+    for label, stats in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before:
+            print(f"  {label:<28}{stats['throughput_rps']:>10}{'new':>10}{stats['p95_ms']:>10}{'':>10}", file=sys.stderr)
+            continue
+
+        def change(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+
+        print(f"  {label:<28}{stats['throughput_rps']:>10}{change(stats['throughput_rps'], before['throughput_rps']):>10}"
+              f"{stats['p95_ms']:>10}{change(stats['p95_ms'], before['p95_ms']):>10}", file=sys.stderr)
+
+
+def fetch_json(host, port, path, timeout=10):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    except (OSError, http.client.HTTPException, json.JSONDecodeError):
+        return None
+    finally:
+        conn.close()
+
+
+def wait_until_ready(host, port, process, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        if fetch_json(host, port, '/api/config', timeout=2) is not None:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def build_config(args, workdir):
+    """Copy the base config and point it at the stubs with background work switched off"""
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config = copy.deepcopy(config)
+    set_path(config, 'aiProvider.url', f'http://127.0.0.1:{args.stub_port}')
+    # Never let backends from the base config receive benchmark load
+    config.get('aiProvider', {}).pop('backends', None)
+    if args.stubs > 1:
+        set_path(config, 'aiProvider.backends', [
+            {"name": f"stub-{i + 1}", "url": f"http://127.0.0.1:{args.stub_port + i}"} for i in range(args.stubs)
+        ])
+    set_path(config, 'server.port', args.port)
+    set_path(config, 'cache.persistPath', None)
+    set_path(config, 'requestLog.path', str(workdir / 'requests.jsonl'))
+    set_path(config, 'niceList.storePath', str(workdir / 'naughty-list.json'))
+    if not args.background:
+        set_path(config, 'messagePool.enabled', False)
+        set_path(config, 'aiProvider.healthChecks.enabled', False)
+    for assignment in args.set:
+        key, _, raw = assignment.partition('=')
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        set_path(config, key.strip(), value)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Santa Tracker server against a stub Ollama')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='Unmeasured seconds before measuring')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client connections')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='Weighted scenarios: static, config, models, generate, generate_stream, generate_cached')
+    parser.add_argument('--replay', help='Replay records from a request log (requests.jsonl) instead of the mix')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request client timeout')
+    parser.add_argument('--server-url', help='Benchmark an already running server instead of starting one')
+    parser.add_argument('--port', type=int, default=8800, help='Port for the server under test')
+    parser.add_argument('--config', default=str(REPO_DIR / 'config' / 'santa-config.json'), help='Base config')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=JSON',
+                        help='Override a config value, e.g. --set server.maxConcurrency=4')
+    parser.add_argument('--background', action='store_true',
+                        help='Keep the message pool and health checks running during the benchmark')
+    parser.add_argument('--stub-port', type=int, default=11500, help='Port of the first stub')
+    parser.add_argument('--stubs', type=int, default=1,
+                        help='Stub Ollama servers to start on consecutive ports (more than 1 sets aiProvider.backends)')
+    parser.add_argument('--stub-latency', type=float, default=0.1, help='Stub seconds before the first token')
+    parser.add_argument('--stub-tps', type=float, default=50, help='Stub tokens per second (0 = instant)')
+    parser.add_argument('--stub-tokens', type=int, default=40, help='Stub tokens per response')
+    parser.add_argument('--stub-cold-load', type=float, default=0.0, help='Stub first-request load time per model')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--compare', help='Print changes against an earlier JSON report')
+    args = parser.parse_args()
+    if args.stubs < 1:
+        parser.error('--stubs must be at least 1')
+
+    processes = []
+    workdir = Path(tempfile.mkdtemp(prefix='santa-bench-'))
+    try:
+        if args.server_url:
+            target = urllib.parse.urlsplit(args.server_url)
+            host, port = target.hostname or 'localhost', target.port or 80
+            config = fetch_json(host, port, '/api/config') or {}
+            server = None
+        else:
+            config = build_config(args, workdir)
+            config_path = workdir / 'santa-config.json'
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=2)
+            provider = config.get('aiProvider', {})
+            models = {normalize_model(provider.get('defaultModel', 'llama3.2'))}
+            models.update(normalize_model(m['name']) for m in provider.get('availableModels', []) if m.get('name'))
+
+            for i in range(args.stubs):
+                stub_log = open(workdir / f'stub-{i + 1}.log', 'w')
+                processes.append(subprocess.Popen([
+                    sys.executable, str(BENCH_DIR / 'stub_ollama.py'), '--port', str(args.stub_port + i),
+                    '--models', ','.join(sorted(models)), '--latency', str(args.stub_latency),
+                    '--tokens-per-second', str(args.stub_tps), '--tokens', str(args.stub_tokens),
+                    '--cold-load', str(args.stub_cold_load)
+                ], stdout=stub_log, stderr=subprocess.STDOUT))
+
+            server_log = open(workdir / 'server.log', 'w')
+            server = subprocess.Popen([sys.executable, str(REPO_DIR / 'server.py')], cwd=REPO_DIR,
+                                      env=dict(os.environ, SANTA_CONFIG_FILE=str(config_path)),
+                                      stdout=server_log, stderr=subprocess.STDOUT)
+            processes.append(server)
+            host, port = '127.0.0.1', args.port
+
+        if not wait_until_ready(host, port, server):
+            log = (workdir / 'server.log')
+            print(log.read_text() if log.exists() else '', file=sys.stderr)
+            raise SystemExit(f"❌ Server on {host}:{port} did not become ready")
+
+        model = normalize_model(config.get('aiProvider', {}).get('defaultModel', 'llama3.2'))
+        if args.replay:
+            replay = load_replay(args.replay, model)
+            position = [0]
+            replay_lock = threading.Lock()
+
+            def next_request():
+                with replay_lock:
+                    item = replay[position[0] % len(replay)]
+                    position[0] += 1
+                return item
+            mix = None
+        else:
+            mix = parse_mix(args.mix)
+            scenario = Scenario(model)
+            names, weights = list(mix), list(mix.values())
+            for name in names:
+                scenario.build(name)
+
+            def next_request():
+                return scenario.build(random.choices(names, weights)[0])
+
+        print(f"🏁 Benchmarking {host}:{port} for {args.duration}s with {args.concurrency} connections "
+              f"(logs in {workdir})...", file=sys.stderr)
+        generator = LoadGenerator(host, port, next_request, args.concurrency, args.timeout)
+        started_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        generator.run(args.warmup, args.duration)
+
+        samples = generator.samples
+        total = len(samples)
+        errors = sum(1 for _, status, _, _, _ in samples if status == 0 or status >= 400)
+        report = {
+            "started_at": started_at,
+            "duration_seconds": args.duration,
+            "concurrency": args.concurrency,
+            "mode": "replay" if args.replay else "mix",
+            "mix": mix,
+            "replay": args.replay,
+            "stub": None if args.server_url else {
+                "count": args.stubs,
+                "latency_seconds": args.stub_latency,
+                "tokens_per_second": args.stub_tps,
+                "tokens": args.stub_tokens,
+                "cold_load_seconds": args.stub_cold_load
+            },
+            "overrides": args.set,
+            "totals": {
+                "requests": total,
+                "errors": errors,
+                "throughput_rps": round(total / args.duration, 2)
+            },
+            "endpoints": summarize(samples, args.duration),
+            "server_metrics": fetch_json(host, port, '/api/metrics?format=json')
+        }
+
+        output = json.dumps(report, indent=2)
+        print(output)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        if args.compare:
+            compare(report, args.compare)
+    finally:
+        for process in reversed(processes):
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+                try:
+                    process.wait(15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Stub Ollama server for benchmarking the Santa Tracker server without a GPU.
+
+Implements /api/generate and /api/chat (streaming and non-streaming),
+/api/tags, /api/version, /api/ps, /api/pull and /api/delete. Generations wait
+``--latency`` seconds before the first token, then emit tokens at
+``--tokens-per-second`` and report Ollama-style eval/load durations.
+
+    python3 bench/stub_ollama.py --port 11500 --latency 0.2 --tokens-per-second 40
+"""
+
+import argparse
+import http.server
+import json
+import socketserver
+import threading
+import time
+
+WORDS = ("Ho ho ho! The reindeer are flying fast tonight and the sleigh is full of presents "
+         "for every good child around the world. Merry Christmas from the North Pole!").split()
+
+
+class StubOllama:
+    """Behaviour knobs and counters shared by all request threads"""
+
+    def __init__(self, models, latency, tokens_per_second, tokens, cold_load):
+        self.models = list(models)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.cold_load = cold_load
+        self.loaded = set()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def take_load_time(self, model):
+        """Seconds spent 'loading' the model: cold_load the first time, then ~0"""
+        with self.lock:
+            self.requests += 1
+            if model in self.loaded:
+                return 0.001
+            self.loaded.add(model)
+            return self.cold_load
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return {}
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        line = json.dumps(data).encode('utf-8') + b'\n'
+        self.wfile.write(f'{len(line):X}\r\n'.encode('ascii') + line + b'\r\n')
+        self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json({"models": [{
+                "name": name, "model": name, "size": 2_000_000_000,
+                "modified_at": "2024-12-01T00:00:00Z",
+                "details": {"family": "llama", "parameter_size": "3B", "quantization_level": "Q4_K_M"}
+            } for name in self.stub.models]})
+        elif self.path == '/api/version':
+            self.send_json({"version": "0.0.0-stub"})
+        elif self.path == '/api/ps':
+            self.send_json({"models": [{"name": name, "model": name, "size_vram": 2_000_000_000}
+                                       for name in sorted(self.stub.loaded)]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self.read_json()
+        if self.path in ('/api/generate', '/api/chat'):
+            self.generate(body, chat=self.path == '/api/chat')
+        elif self.path == '/api/pull':
+            self.pull(body)
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self):
+        body = self.read_json()
+        name = body.get('model') or body.get('name')
+        with self.stub.lock:
+            if name in self.stub.models:
+                self.stub.models.remove(name)
+                self.stub.loaded.discard(name)
+                found = True
+            else:
+                found = False
+        self.send_json({} if found else {"error": f"model '{name}' not found"}, 200 if found else 404)
+
+    def generate(self, body, chat=False):
+        model = body.get('model', 'unknown')
+        if not body.get('prompt') and not body.get('messages'):
+            # Like Ollama: an empty request loads the model, or unloads it with keep_alive 0
+            if body.get('keep_alive') in (0, '0', '0s'):
+                with self.stub.lock:
+                    self.stub.loaded.discard(model)
+                self.send_json({"model": model, "response": "", "done": True, "done_reason": "unload"})
+            else:
+                load_seconds = self.stub.take_load_time(model)
+                time.sleep(load_seconds)
+                self.send_json({"model": model, "response": "", "done": True, "done_reason": "load",
+                                "load_duration": int(load_seconds * 1e9)})
+            return
+        load_seconds = self.stub.take_load_time(model)
+        num_predict = (body.get('options') or {}).get('num_predict')
+        count = min(self.stub.tokens, num_predict) if num_predict and num_predict > 0 else self.stub.tokens
+        tokens = [WORDS[i % len(WORDS)] + ' ' for i in range(count)]
+        token_delay = 1.0 / self.stub.tokens_per_second if self.stub.tokens_per_second > 0 else 0.0
+        prompt = body.get('prompt') or json.dumps(body.get('messages', []))
+
+        def piece(text):
+            return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+        time.sleep(load_seconds + self.stub.latency)
+        started = time.monotonic()
+        stats = {
+            "model": model,
+            "done": True,
+            "done_reason": "stop",
+            "load_duration": int(load_seconds * 1e9),
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "prompt_eval_duration": int(self.stub.latency * 1e9),
+            "eval_count": count
+        }
+
+        if body.get('stream', True):
+            self.start_chunked()
+            for token in tokens:
+                if token_delay:
+                    time.sleep(token_delay)
+                self.write_chunk(dict(piece(token), model=model, done=False))
+            eval_seconds = time.monotonic() - started
+            self.write_chunk(dict(piece(''), eval_duration=int(eval_seconds * 1e9),
+                                  total_duration=int((eval_seconds + load_seconds + self.stub.latency) * 1e9), **stats))
+            self.end_chunked()
+        else:
+            time.sleep(token_delay * count)
+            eval_seconds = time.monotonic() - started
+            self.send_json(dict(piece(''.join(tokens).strip()), eval_duration=int(eval_seconds * 1e9),
+                                total_duration=int((eval_seconds + load_seconds + self.stub.latency) * 1e9), **stats))
+
+    def pull(self, body):
+        name = body.get('model') or body.get('name') or 'unknown'
+        total = 2_000_000_000
+        self.start_chunked()
+        self.write_chunk({"status": "pulling manifest"})
+        for step in range(1, 11):
+            time.sleep(self.stub.latency / 10)
+            self.write_chunk({"status": "pulling layer", "digest": "sha256:stub", "total": total, "completed": total * step // 10})
+        self.write_chunk({"status": "verifying sha256 digest"})
+        with self.stub.lock:
+            if name not in self.stub.models:
+                self.stub.models.append(name)
+        self.write_chunk({"status": "success"})
+        self.end_chunked()
+
+
+class StubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(port, models, latency=0.1, tokens_per_second=50, tokens=40, cold_load=0.0):
+    """Build a stub server (call serve_forever() on it, or run it on a thread)"""
+    handler = type('BoundStubHandler', (StubHandler,), {
+        'stub': StubOllama(models, latency, tokens_per_second, tokens, cold_load)
+    })
+    return StubServer(('127.0.0.1', port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Ollama server for benchmarks')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--models', default='llama3.2:latest',
+                        help='Comma-separated model names reported by /api/tags')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=50, help='Token rate (0 = instant)')
+    parser.add_argument('--tokens', type=int, default=40, help='Tokens per response')
+    parser.add_argument('--cold-load', type=float, default=0.0,
+                        help='Extra seconds on the first request for each model')
+    args = parser.parse_args()
+
+    server = make_server(args.port, [m.strip() for m in args.models.split(',') if m.strip()],
+                         args.latency, args.tokens_per_second, args.tokens, args.cold_load)
+    print(f"🧪 Stub Ollama on http://127.0.0.1:{args.port} "
+          f"({args.latency}s latency, {args.tokens_per_second} tok/s, {args.tokens} tokens)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -5,27 +5,3198 @@ Comprehensive HTTP server with Ollama proxy, configuration management, and model
 """
 
 import http.server
-import socketserver
 import os
 import json
-import urllib.request
 import urllib.error
 import urllib.parse
 from pathlib import Path
 import threading
 import time
+import signal
+import queue
+import io
+import select
+import http.client
+import hashlib
+import copy
+import tempfile
+import uuid
+import gzip
+import mimetypes
+import email.utils
+import re
+import unicodedata
+import bisect
+import random
+import contextlib
+import itertools
+from collections import OrderedDict, deque
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 PORT = 8000
 OLLAMA_URL = "http://localhost:11434"
 CONFIG_DIR = Path(__file__).parent / "config"
-CONFIG_FILE = CONFIG_DIR / "santa-config.json"
+# SANTA_CONFIG_FILE points the server at another config (e.g. the benchmark harness)
+CONFIG_FILE = Path(os.environ.get("SANTA_CONFIG_FILE") or CONFIG_DIR / "santa-config.json")
+BASE_DIR = Path(__file__).parent
+
+# Concurrency defaults (overridable under "server" in santa-config.json)
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_QUEUED = 32
+DEFAULT_RETRY_AFTER = 2
+DEFAULT_DRAIN_TIMEOUT = 30
+# Idle or stalled client sockets are dropped after this many seconds so they free their worker
+DEFAULT_CLIENT_TIMEOUT = 30
+
+# Connection pool defaults (overridable under "aiProvider.connectionPool")
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_IDLE_TIMEOUT = 30
+DEFAULT_OLLAMA_TIMEOUTS = {
+    "generate": 120,
+    "tags": 10,
+    "version": 5,
+    "pull": 1800,
+    "delete": 120,
+    "health": 10
+}
+
+# Backend routing defaults (backends under "aiProvider.backends", breaker under "aiProvider.circuitBreaker")
+DEFAULT_CIRCUIT_BREAKER_SETTINGS = {
+    "failureThreshold": 3,
+    "cooldownSeconds": 15
+}
+
+# Admission control defaults (overridable under "aiProvider.admission")
+PRIORITIES = ('interactive', 'background')
+DEFAULT_ADMISSION_SETTINGS = {
+    "enabled": True,
+    "maxConcurrentPerModel": 3,
+    "modelLimits": {},
+    "interactiveReserve": 1,
+    "maxQueuedPerModel": 50,
+    "deadlineSeconds": {"interactive": 30, "background": 300},
+    "retryAfterSeconds": 5
+}
+
+# Model catalog defaults (overridable under "aiProvider.modelCatalog")
+DEFAULT_CATALOG_TTL = 30
+DEFAULT_CATALOG_MAX_STALE = 600
+
+# Model health check defaults (overridable under "aiProvider.healthChecks")
+DEFAULT_HEALTH_SETTINGS = {
+    "enabled": True,
+    "intervalSeconds": 300,
+    "maxParallel": 2,
+    "loadedOnly": True
+}
+
+# Model warm-up defaults (overridable under "aiProvider.warmup")
+DEFAULT_WARMUP_SETTINGS = {
+    "enabled": True,
+    "onStartup": True,
+    "onSwitch": True,
+    "keepAlive": "30m",
+    "unloadInactive": False,
+    "waitTimeoutSeconds": 60
+}
+
+# Model pull defaults (overridable under "aiProvider.pulls")
+DEFAULT_PULL_SETTINGS = {
+    "maxConcurrentPulls": 1,
+    "jobRetentionSeconds": 3600
+}
+
+# Static asset cache defaults (overridable under "server.staticCache")
+DEFAULT_STATIC_SETTINGS = {
+    "enabled": True,
+    "maxFileBytes": 8 * 1024 * 1024,
+    "cacheControl": "no-cache",
+    "cacheControlByExtension": {
+        ".png": "public, max-age=86400",
+        ".ico": "public, max-age=86400"
+    }
+}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+
+# Pre-generated Santa message pool defaults (overridable under "messagePool")
+# Off by default: the bundled UI generates its own messages, so refills would spend GPU time on unread text
+DEFAULT_MESSAGE_POOL_SETTINGS = {
+    "enabled": False,
+    "size": 3,
+    "refillIntervalSeconds": 5,
+    "maxAgeSeconds": 1800,
+    "idleOnly": True,
+    "languages": ["en", "ko"],
+    "languageModels": {}
+}
+# A pool whose refills keep failing (e.g. its model isn't installed) is retried at most this rarely
+MESSAGE_POOL_MAX_BACKOFF = 300
+SANTA_PHASES = ('preparing', 'delivering', 'finished')
+
+# Distance (km) and gift-count buckets used to fill {{DISTANCE_CONTEXT}}/{{GIFTS_CONTEXT}}
+DISTANCE_BUCKETS = [
+    (100, "nearby", "He is very close to your home, less than 100 km away!",
+     "산타는 당신의 집에서 100km도 안 되는 아주 가까운 곳에 있습니다!"),
+    (1000, "near", "He is less than 1,000 km away from your location.",
+     "산타는 당신의 위치에서 1,000km 이내에 있습니다."),
+    (5000, "region", "He is a few thousand kilometers away from your location.",
+     "산타는 당신의 위치에서 수천 km 떨어져 있습니다."),
+    (None, "far", "He is far away on the other side of the world, but on his way!",
+     "산타는 지구 반대편에 있지만 당신을 향해 오고 있습니다!")
+]
+GIFT_BUCKETS = [
+    (1_000_000, "starting", "He has just started delivering gifts!",
+     "산타가 이제 막 선물 배달을 시작했습니다!"),
+    (100_000_000, "millions", "He has already delivered millions of gifts!",
+     "산타는 벌써 수백만 개의 선물을 배달했습니다!"),
+    (None, "100m_plus", "He has delivered over a hundred million gifts so far!",
+     "산타는 지금까지 1억 개가 넘는 선물을 배달했습니다!")
+]
+KOREAN_PHASE_CONTEXT = {
+    "preparing": "산타는 크리스마스 이브를 위해 북극에서 준비하고 있습니다. 엘프들이 선물을 포장하느라 바쁩니다.",
+    "delivering": "산타가 현재 전세계에 선물을 배달하고 있습니다! {{DISTANCE_CONTEXT}} {{GIFTS_CONTEXT}}",
+    "finished": "산타가 크리스마스 배달을 마치고 순록들과 함께 북극에서 쉬고 있습니다."
+}
+
+# Batch generation defaults (overridable under "batch")
+DEFAULT_BATCH_SETTINGS = {
+    "maxParallel": 2,
+    "maxItems": 50
+}
+
+# Nice List defaults (overridable under "niceList")
+DEFAULT_NICE_LIST_SETTINGS = {
+    "storePath": "config/naughty-list.json",
+    "verdictTtlSeconds": 3600,
+    "maxCachedVerdicts": 1000
+}
+NICE_LIST_PROMPTS = {
+    "en": (
+        'You are Santa Claus checking your Nice and Naughty lists! Someone named "{name}" wants to know '
+        "if they're on the Nice List this year.\n\n"
+        "Based on the name alone (be creative and playful), determine if they've been:\n"
+        "1. NICE - Give them a cheerful, encouraging message about being on the Nice List\n"
+        "2. NAUGHTY - Give them a gentle, playful warning about being on the Naughty List, "
+        "but with encouragement to be better\n\n"
+        "Respond with EXACTLY this format:\n"
+        "STATUS: [NICE or NAUGHTY]\n"
+        "MESSAGE: [Your personalized message as Santa - 1-2 sentences, warm and jolly, mention their name]\n\n"
+        "Be creative, fun, and maintain the magical Christmas spirit!"
+    ),
+    "ko": (
+        "시스템: 당신은 순수 한국어로만 말하는 산타클로스입니다. 절대로 다른 언어를 섞지 마세요.\n\n"
+        '작업: "{name}"라는 사람이 착한 아이 목록에 있는지 확인해주세요.\n\n'
+        "형식:\n"
+        "STATUS: [NICE 또는 NAUGHTY]\n"
+        "MESSAGE: [순수 한국어로만 작성된 1-2문장 메시지, {name}님을 언급]\n\n"
+        "지시사항: 오직 한국어만 사용하고, 창의적이고 따뜻하게 작성하세요.\n\n"
+        "산타의 답변:"
+    )
+}
+NICE_LIST_MESSAGES = {
+    "en": {
+        "custom": "{name}, you're on my custom Naughty List! Be good and you might get presents this Christmas! 🎄",
+        "nice": "Ho ho ho! {name}, you're definitely on my Nice List this year!"
+    },
+    "ko": {
+        "custom": "{name}님, 제가 만든 말썽꾸러기 목록에 있으시네요! 더 착하게 행동해야 크리스마스에 선물을 받을 수 있어요! 🎄",
+        "nice": "호호호! {name}님, 올해 착한 아이 목록에 확실히 있으시네요!"
+    }
+}
+
+# Generation cache defaults (overridable under "cache")
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "maxEntries": 256,
+    "maxBytes": 16 * 1024 * 1024,
+    "ttlSeconds": 3600,
+    "cacheNonDeterministic": False,
+    "variants": 5,
+    "persistPath": "cache/generate-cache.json",
+    "persistIntervalSeconds": 300
+}
+
+# Structured request log defaults (overridable under "requestLog")
+DEFAULT_REQUEST_LOG_SETTINGS = {
+    "enabled": True,
+    # Outside the served directory: records hold prompts with private family details
+    "path": "~/.santa-tracker/logs/requests.jsonl",
+    "maxBytes": 10 * 1024 * 1024,
+    "backupCount": 5,
+    "queueSize": 10000,
+    "batchSize": 200,
+    "flushIntervalSeconds": 1.0,
+    "maxTextChars": 500,
+    "textSampleRate": 1.0,
+    "console": False
+}
+
+# Server state under BASE_DIR that the static file server must never hand out
+PRIVATE_STATIC_DIRS = ('logs', 'cache')
+
+# Latency histogram bucket bounds in seconds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# An Ollama load_duration above this means the model had to be loaded into memory
+COLD_LOAD_THRESHOLD = 0.5
+# Distinct route/model labels kept before new ones are folded into "other"
+MAX_METRIC_ROUTES = 100
+MAX_METRIC_MODELS = 50
+
+
+def run_bounded(func, items, max_parallel):
+    """Run ``func`` over ``items`` on at most ``max_parallel`` daemon threads.
+
+    Yields ``(item, result, error)`` tuples in completion order so callers can
+    act on each result as soon as it is ready.
+    """
+    items = list(items)
+    if not items:
+        return
+    work = queue.Queue()
+    done = queue.Queue()
+    for item in items:
+        work.put(item)
+
+    def worker():
+        while True:
+            try:
+                item = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                done.put((item, func(item), None))
+            except Exception as e:
+                done.put((item, None, e))
+
+    for _ in range(max(1, min(int(max_parallel), len(items)))):
+        threading.Thread(target=worker, daemon=True).start()
+    for _ in range(len(items)):
+        yield done.get()
+
+
+def prometheus_label(value):
+    """Escape a value for use inside a Prometheus label"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; callers hold the registry lock"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that holds it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = max(self.bounds[i - 1] if i > 0 else 0.0, self.min)
+                upper = min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 6),
+            "avg_seconds": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50_seconds": round(self.quantile(0.50), 6),
+            "p95_seconds": round(self.quantile(0.95), 6),
+            "p99_seconds": round(self.quantile(0.99), 6)
+        }
+
+    def prometheus_lines(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """In-process request and model metrics behind /api/metrics.
+
+    Every HTTP request is recorded per method and route template (so
+    /api/models/pull/<job> counts as one route), along with time spent
+    waiting for a worker. Ollama generations are recorded per model from the
+    eval/load durations Ollama reports, giving tokens/sec and how often a
+    request paid for a cold model load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self._routes = {}
+        self._models = {}
+        self._queue_wait = Histogram()
+
+    @staticmethod
+    def route_label(method, path):
+        """Collapse a request path to a low-cardinality route template"""
+        path = urllib.parse.urlsplit(path).path
+        if not path.startswith('/api/'):
+            return 'static'
+        parts = [p for p in path.split('/') if p]
+        if parts[:3] == ['api', 'models', 'pull'] and len(parts) > 3:
+            return '/api/models/pull/{job_id}' + ('/' + '/'.join(parts[4:]) if len(parts) > 4 else '')
+        if parts[:3] == ['api', 'nicelist', 'naughty'] and len(parts) > 3:
+            return '/api/nicelist/naughty/{name}'
+        if parts[:2] == ['api', 'models'] and len(parts) == 3 and method == 'DELETE':
+            return '/api/models/{name}'
+        return '/' + '/'.join(parts[:4])
+
+    def record_request(self, method, path, status, seconds):
+        key = (method, self.route_label(method, path))
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                if len(self._routes) >= MAX_METRIC_ROUTES:
+                    key = (method, 'other')
+                    stats = self._routes.get(key)
+                if stats is None:
+                    stats = self._routes[key] = {"requests": 0, "errors": 0, "statuses": {}, "latency": Histogram()}
+            stats["requests"] += 1
+            if status >= 500:
+                stats["errors"] += 1
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            stats["latency"].observe(seconds)
+
+    def record_queue_wait(self, seconds):
+        with self._lock:
+            self._queue_wait.observe(seconds)
+
+    def record_generation(self, model, seconds, result=None, error=False):
+        """Record one upstream generation; ``result`` is Ollama's final (done) JSON"""
+        # Same label as admission and warm-up, so "llama3" and "llama3:latest" share a series
+        model = ModelCatalog.normalize(str(model)) if model else 'unknown'
+        with self._lock:
+            stats = self._models.get(model)
+            if stats is None and len(self._models) >= MAX_METRIC_MODELS:
+                model = 'other'
+                stats = self._models.get(model)
+            if stats is None:
+                stats = self._models[model] = {
+                    "requests": 0, "errors": 0, "latency": Histogram(),
+                    "prompt_tokens": 0, "eval_tokens": 0, "prompt_eval_seconds": 0.0,
+                    "eval_seconds": 0.0, "load_seconds": 0.0, "cold_loads": 0
+                }
+            stats["requests"] += 1
+            stats["latency"].observe(seconds)
+            if error:
+                stats["errors"] += 1
+            if not isinstance(result, dict):
+                return
+            stats["prompt_tokens"] += int(result.get('prompt_eval_count') or 0)
+            stats["eval_tokens"] += int(result.get('eval_count') or 0)
+            stats["prompt_eval_seconds"] += (result.get('prompt_eval_duration') or 0) / 1e9
+            stats["eval_seconds"] += (result.get('eval_duration') or 0) / 1e9
+            load_seconds = (result.get('load_duration') or 0) / 1e9
+            stats["load_seconds"] += load_seconds
+            if load_seconds > COLD_LOAD_THRESHOLD:
+                stats["cold_loads"] += 1
+
+    def snapshot(self, server=None):
+        """All metrics as a JSON-friendly dict"""
+        with self._lock:
+            routes = [{
+                "method": method,
+                "route": route,
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "statuses": {str(code): n for code, n in sorted(s["statuses"].items())},
+                "latency": s["latency"].to_dict()
+            } for (method, route), s in sorted(self._routes.items(), key=lambda item: item[0][::-1])]
+            models = {name: {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "latency": s["latency"].to_dict(),
+                "prompt_tokens": s["prompt_tokens"],
+                "eval_tokens": s["eval_tokens"],
+                "tokens_per_second": round(s["eval_tokens"] / s["eval_seconds"], 2) if s["eval_seconds"] else 0.0,
+                "prompt_eval_seconds": round(s["prompt_eval_seconds"], 3),
+                "eval_seconds": round(s["eval_seconds"], 3),
+                "load_seconds": round(s["load_seconds"], 3),
+                "cold_loads": s["cold_loads"],
+                "cold_load_rate": round(s["cold_loads"] / s["requests"], 4) if s["requests"] else 0.0
+            } for name, s in sorted(self._models.items())}
+            queue_wait = self._queue_wait.to_dict()
+
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "server": {
+                "active_requests": server.active_requests() if server else 0,
+                "max_concurrency": server.max_concurrency if server else 0,
+                "rejected": server.rejected_count if server else 0,
+                "queue_wait": queue_wait
+            },
+            "routes": routes,
+            "models": models,
+            "cache": generation_cache.stats(),
+            "coalescing": request_coalescer.stats(),
+            "admission": admission.stats(),
+            "backends": ollama_backends.status(),
+            "request_log": request_log.stats()
+        }
+
+    def render_prometheus(self, server=None):
+        """All metrics in the Prometheus text exposition format"""
+        esc = prometheus_label
+        lines = [
+            '# HELP santa_uptime_seconds Seconds since the server started',
+            '# TYPE santa_uptime_seconds gauge',
+            f'santa_uptime_seconds {time.time() - self.started:.1f}'
+        ]
+        if server is not None:
+            lines += [
+                '# HELP santa_active_requests Requests running or waiting for a worker',
+                '# TYPE santa_active_requests gauge',
+                f'santa_active_requests {server.active_requests()}',
+                '# HELP santa_rejected_requests_total Requests rejected with 503 because the server was saturated',
+                '# TYPE santa_rejected_requests_total counter',
+                f'santa_rejected_requests_total {server.rejected_count}'
+            ]
+
+        with self._lock:
+            lines += ['# HELP santa_queue_wait_seconds Time a connection waited for a free worker',
+                      '# TYPE santa_queue_wait_seconds histogram']
+            lines += self._queue_wait.prometheus_lines('santa_queue_wait_seconds', 'pool="http"')
+
+            lines += ['# HELP santa_http_requests_total HTTP requests by route and status',
+                      '# TYPE santa_http_requests_total counter']
+            for (method, route), s in sorted(self._routes.items()):
+                for code, n in sorted(s["statuses"].items()):
+                    lines.append(f'santa_http_requests_total{{method="{method}",route="{esc(route)}",status="{code}"}} {n}')
+            lines += ['# HELP santa_http_request_duration_seconds HTTP request latency by route',
+                      '# TYPE santa_http_request_duration_seconds histogram']
+            for (method, route), s in sorted(self._routes.items()):
+                lines += s["latency"].prometheus_lines('santa_http_request_duration_seconds',
+                                                       f'method="{method}",route="{esc(route)}"')
+
+            counters = [
+                ('santa_model_requests_total', 'counter', 'Upstream generations by model', 'requests'),
+                ('santa_model_errors_total', 'counter', 'Failed upstream generations by model', 'errors'),
+                ('santa_model_prompt_tokens_total', 'counter', 'Prompt tokens evaluated', 'prompt_tokens'),
+                ('santa_model_eval_tokens_total', 'counter', 'Tokens generated', 'eval_tokens'),
+                ('santa_model_prompt_eval_seconds_total', 'counter', 'Time spent evaluating prompts', 'prompt_eval_seconds'),
+                ('santa_model_eval_seconds_total', 'counter', 'Time spent generating tokens', 'eval_seconds'),
+                ('santa_model_load_seconds_total', 'counter', 'Time spent loading models', 'load_seconds'),
+                ('santa_model_cold_loads_total', 'counter', 'Generations that had to load the model first', 'cold_loads')
+            ]
+            for name, kind, help_text, field in counters:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for model, s in sorted(self._models.items()):
+                    lines.append(f'{name}{{model="{esc(model)}"}} {round(s[field], 6)}')
+            lines += ['# HELP santa_model_generation_seconds Upstream generation latency by model',
+                      '# TYPE santa_model_generation_seconds histogram']
+            for model, s in sorted(self._models.items()):
+                lines += s["latency"].prometheus_lines('santa_model_generation_seconds', f'model="{esc(model)}"')
+
+        cache = generation_cache.stats()
+        coalescing = request_coalescer.stats()
+        lines += [
+            '# HELP santa_cache_hits_total Generation cache hits',
+            '# TYPE santa_cache_hits_total counter',
+            f'santa_cache_hits_total {cache["hits"]}',
+            '# HELP santa_cache_misses_total Generation cache misses',
+            '# TYPE santa_cache_misses_total counter',
+            f'santa_cache_misses_total {cache["misses"]}',
+            '# HELP santa_cache_entries Entries in the generation cache',
+            '# TYPE santa_cache_entries gauge',
+            f'santa_cache_entries {cache["entries"]}',
+            '# HELP santa_coalesced_requests_total Requests answered from an identical in-flight request',
+            '# TYPE santa_coalesced_requests_total counter',
+            f'santa_coalesced_requests_total {coalescing["coalesced"]}'
+        ]
+        lines += admission.prometheus_lines()
+        lines += ollama_backends.prometheus_lines()
+        log_stats = request_log.stats()
+        lines += [
+            '# HELP santa_request_log_written_total Request log records written to disk',
+            '# TYPE santa_request_log_written_total counter',
+            f'santa_request_log_written_total {log_stats["written"]}',
+            '# HELP santa_request_log_dropped_total Request log records dropped (queue full or write error)',
+            '# TYPE santa_request_log_dropped_total counter',
+            f'santa_request_log_dropped_total {log_stats["dropped"]}',
+            '# HELP santa_request_log_queued Request log records waiting for the writer',
+            '# TYPE santa_request_log_queued gauge',
+            f'santa_request_log_queued {log_stats["queued"]}'
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+class RequestLog:
+    """Asynchronous JSONL log of proxied AI requests.
+
+    Request threads only build a dict and ``put_nowait`` it on a bounded
+    queue; when the queue is full the record is dropped and counted instead
+    of blocking. A background writer drains the queue in batches, appends
+    them to ``path`` and rotates the file past ``maxBytes`` (keeping
+    ``backupCount`` old files as ``requests.jsonl.1``, ``.2``, ...). Prompt
+    and response text is truncated to ``maxTextChars`` and only kept for a
+    ``textSampleRate`` fraction of records; the metadata is always logged.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        """Apply settings from the "requestLog" config section (before start())"""
+        merged = dict(DEFAULT_REQUEST_LOG_SETTINGS)
+        merged.update(settings or {})
+        self.enabled = bool(merged['enabled'])
+        path = merged.get('path')
+        self.path = (BASE_DIR / Path(path).expanduser()) if path else None
+        self.max_bytes = max(1024, int(merged['maxBytes']))
+        self.backup_count = max(0, int(merged['backupCount']))
+        self.queue_size = max(1, int(merged['queueSize']))
+        self.batch_size = max(1, int(merged['batchSize']))
+        self.flush_interval = max(0.05, float(merged['flushIntervalSeconds']))
+        self.max_text_chars = max(0, int(merged['maxTextChars']))
+        self.text_sample_rate = min(1.0, max(0.0, float(merged['textSampleRate'])))
+        self.console = bool(merged['console'])
+
+    def start(self):
+        """Start the background writer"""
+        if (not self.enabled or not self.path) and not self.console:
+            return
+        if self._thread:
+            return
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(target=self._writer_loop, name='request-log', daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=5):
+        """Flush queued records and stop the writer"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def include_text(self):
+        """Decide once per request whether prompt/response text is sampled into the log"""
+        return self.text_sample_rate >= 1.0 or random.random() < self.text_sample_rate
+
+    def truncate(self, text):
+        text = '' if text is None else str(text)
+        if len(text) <= self.max_text_chars:
+            return text
+        return text[:self.max_text_chars] + '…'
+
+    def log(self, record):
+        """Queue a record without ever blocking the caller"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _writer_loop(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        if self.console:
+            for record in batch:
+                print(self.format_console(record))
+        if not self.enabled or not self.path:
+            return
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch).encode('utf-8')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.write(data)
+                size = f.tell()
+            with self._lock:
+                self.written += len(batch)
+            if size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            with self._lock:
+                self.write_errors += 1
+                self.dropped += len(batch)
+            print(f"⚠️ Request log write failed: {e}")
+
+    def _rotate(self):
+        if self.backup_count == 0:
+            self.path.unlink(missing_ok=True)
+        else:
+            for i in range(self.backup_count - 1, 0, -1):
+                older = self.path.with_name(f'{self.path.name}.{i}')
+                if older.exists():
+                    os.replace(older, self.path.with_name(f'{self.path.name}.{i + 1}'))
+            os.replace(self.path, self.path.with_name(f'{self.path.name}.1'))
+        with self._lock:
+            self.rotations += 1
+
+    @staticmethod
+    def format_console(record):
+        """One-line human-readable summary for ``console`` mode"""
+        parts = [f"🤖 {record.get('method', '')} {record.get('path', '')}", str(record.get('model') or '-'),
+                 str(record.get('status', '')), f"{record.get('duration_ms', 0)}ms"]
+        if record.get('backend'):
+            parts.append(f"backend={record['backend']}")
+        if record.get('cache'):
+            parts.append(f"cache={record['cache']}")
+        if record.get('coalesced'):
+            parts.append('coalesced')
+        if record.get('error'):
+            parts.append(f"error={record['error']}")
+        if record.get('response') is not None:
+            parts.append(repr(record['response'][:100]))
+        return ' | '.join(parts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "path": str(self.path.relative_to(BASE_DIR)) if self.path and self.path.is_relative_to(BASE_DIR) else str(self.path),
+                "queued": self._queue.qsize() if self._queue else 0,
+                "written": self.written,
+                "dropped": self.dropped,
+                "rotations": self.rotations,
+                "write_errors": self.write_errors
+            }
+
+
+request_log = RequestLog()
+
+
+class ConcurrentHTTPServer(http.server.HTTPServer):
+    """HTTP server that handles requests on a bounded worker pool.
+
+    Up to ``max_concurrency`` requests run at once and up to ``max_queued``
+    more wait for a free worker. Anything beyond that is rejected straight
+    away with 503 + Retry-After so a burst of slow LLM calls cannot pile up
+    unbounded threads. ``drain()`` waits for in-flight requests on shutdown.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_queued=DEFAULT_MAX_QUEUED, retry_after=DEFAULT_RETRY_AFTER):
+        super().__init__(server_address, handler_class)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queued = max(0, int(max_queued))
+        self.retry_after = max(1, int(retry_after))
+        self._requests = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Condition()
+        self.rejected_count = 0
+        # Daemon workers so a hung upstream call cannot block process exit after drain()
+        for i in range(self.max_concurrency):
+            threading.Thread(target=self._worker_loop, name=f'santa-worker-{i}', daemon=True).start()
+
+    def process_request(self, request, client_address):
+        """Hand the connection to the worker pool, or reject it when saturated"""
+        with self._pending_lock:
+            if self._pending >= self.max_concurrency + self.max_queued:
+                self.rejected_count += 1
+                saturated = True
+            else:
+                self._pending += 1
+                saturated = False
+
+        if saturated:
+            self.reject_request(request)
+            self.shutdown_request(request)
+            return
+
+        self._requests.put((request, client_address, time.monotonic()))
+
+    def _worker_loop(self):
+        while True:
+            request, client_address, queued_at = self._requests.get()
+            metrics.record_queue_wait(time.monotonic() - queued_at)
+            self._process_request_worker(request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._pending_lock:
+                self._pending -= 1
+                self._pending_lock.notify_all()
+
+    def reject_request(self, request):
+        """Answer with 503 + Retry-After without occupying a worker"""
+        body = json.dumps({
+            "error": "Server busy",
+            "suggestion": f"Too many requests in progress, retry in {self.retry_after}s"
+        }).encode('utf-8')
+        response = (
+            "HTTP/1.0 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Retry-After: {self.retry_after}\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode('latin-1') + body
+        try:
+            # Consume whatever request bytes already arrived so closing doesn't reset the
+            # connection, without ever blocking the accept loop on a slow client
+            request.setblocking(False)
+            try:
+                request.recv(65536)
+            except BlockingIOError:
+                pass
+            request.settimeout(1.0)
+            request.sendall(response)
+        except OSError:
+            pass
+
+    def active_requests(self):
+        """Number of requests currently running or queued"""
+        with self._pending_lock:
+            return self._pending
+
+    def drain(self, timeout=DEFAULT_DRAIN_TIMEOUT):
+        """Wait for in-flight requests to finish; returns True if fully drained"""
+        deadline = time.monotonic() + timeout
+        with self._pending_lock:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._pending_lock.wait(remaining)
+            return self._pending == 0
+
+
+class UpstreamConnectError(urllib.error.URLError):
+    """Ollama could not be reached, so the request was never handled and may go elsewhere"""
+
+
+class UpstreamTimeout(urllib.error.URLError):
+    """Ollama took the request but did not answer within the timeout"""
+
+
+class PooledResponse:
+    """Wrapper around an upstream response that returns its connection to the pool.
+
+    The connection goes back to the pool only if the body was read to the end
+    and the server allows keep-alive; otherwise it is closed.
+    """
+
+    def __init__(self, pool, conn, response):
+        self._pool = pool
+        self._conn = conn
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        # Set by OllamaBackendRouter: which backend answered, and a hook run once on close
+        self.backend = None
+        self.on_close = None
+
+    def read(self, amt=None):
+        return self._response.read(amt)
+
+    def readline(self, limit=-1):
+        return self._response.readline(limit)
+
+    def __iter__(self):
+        while True:
+            line = self._response.readline()
+            if not line:
+                return
+            yield line
+
+    def close(self):
+        if self._conn is None:
+            return
+        reusable = self._response.isclosed() and not self._response.will_close
+        self._response.close()
+        self._pool.release(self._conn, reusable)
+        self._conn = None
+        if self.on_close is not None:
+            self.on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class OllamaConnectionPool:
+    """Thread-safe pool of keep-alive HTTP connections to the AI provider.
+
+    Keeps up to ``size`` idle connections, drops ones idle for longer than
+    ``idle_timeout`` seconds, and retries once on a fresh connection when a
+    reused one turns out to have been closed by the server. Errors are raised
+    as ``urllib.error.HTTPError``/``URLError`` like ``urlopen`` does.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT, timeouts=None):
+        self._lock = threading.Lock()
+        self._idle = []
+        self.configure(base_url, size, idle_timeout, timeouts)
+
+    def configure(self, base_url=None, size=None, idle_timeout=None, timeouts=None):
+        """Apply settings; changing the URL discards existing connections"""
+        with self._lock:
+            if base_url is not None:
+                parsed = urllib.parse.urlsplit(base_url)
+                if parsed.scheme not in ('http', 'https'):
+                    raise ValueError(f"Unsupported AI provider URL: {base_url}")
+                self.base_url = base_url.rstrip('/')
+                self._scheme = parsed.scheme
+                self._host = parsed.hostname or 'localhost'
+                self._port = parsed.port
+                stale, self._idle = self._idle, []
+            else:
+                stale = []
+            if size is not None:
+                self.size = max(0, int(size))
+            if idle_timeout is not None:
+                self.idle_timeout = float(idle_timeout)
+            self.timeouts = dict(DEFAULT_OLLAMA_TIMEOUTS)
+            self.timeouts.update(timeouts or {})
+        for conn, _ in stale:
+            conn.close()
+
+    def _new_connection(self, timeout):
+        if self._scheme == 'https':
+            return http.client.HTTPSConnection(self._host, self._port, timeout=timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+
+    def _acquire(self, timeout):
+        """Return (connection, reused) preferring the most recently used idle one"""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, idle_since = self._idle.pop()
+                if now - idle_since > self.idle_timeout or self._is_dropped(conn):
+                    conn.close()
+                    continue
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._new_connection(timeout), False
+
+    @staticmethod
+    def _is_dropped(conn):
+        """An idle keep-alive socket that is readable has been closed by the server"""
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+            return bool(readable)
+        except (OSError, ValueError):
+            return True
+
+    def release(self, conn, reusable=True):
+        """Return a connection to the pool after its response was consumed"""
+        if reusable and conn.sock is not None:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+        conn.close()
+
+    def resolve_timeout(self, timeout):
+        """Accept either seconds or a named timeout from the configuration"""
+        if isinstance(timeout, str):
+            return self.timeouts.get(timeout, DEFAULT_OLLAMA_TIMEOUTS['generate'])
+        return timeout if timeout is not None else self.timeouts['generate']
+
+    def request(self, method, path, body=None, timeout=None, headers=None):
+        """Send a request and return a PooledResponse (use it as a context manager)"""
+        timeout = self.resolve_timeout(timeout)
+        request_headers = {'Content-Type': 'application/json'} if body is not None else {}
+        request_headers.update(headers or {})
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(2):
+            conn, reused = self._acquire(timeout)
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.request(method, path, body=body, headers=request_headers)
+            except (ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise UpstreamConnectError(e)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise UpstreamConnectError(e)
+            try:
+                response = conn.getresponse()
+            except TimeoutError as e:
+                conn.close()
+                raise UpstreamTimeout(e)
+            except http.client.RemoteDisconnected as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                # Closed without a reply on a fresh connection: Ollama never handled it
+                raise (urllib.error.URLError(e) if reused else UpstreamConnectError(e))
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+
+            pooled = PooledResponse(self, conn, response)
+            if response.status >= 400:
+                try:
+                    error_body = pooled.read()
+                finally:
+                    pooled.close()
+                raise urllib.error.HTTPError(url, response.status, response.reason,
+                                             response.headers, io.BytesIO(error_body))
+            return pooled
+
+    def get_json(self, path, timeout=None):
+        """GET a JSON document from the provider"""
+        with self.request('GET', path, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def post_json(self, path, payload, timeout=None, method='POST'):
+        """Send a JSON payload and decode the JSON reply"""
+        body = json.dumps(payload).encode('utf-8')
+        with self.request(method, path, body=body, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+
+class OllamaBackend:
+    """One Ollama instance: its connection pool, load, known models and circuit breaker"""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.pool = OllamaConnectionPool(url)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.models = None
+        self.last_error = None
+
+    @property
+    def url(self):
+        return self.pool.base_url
+
+    def breaker_state(self, now, cooldown):
+        if self.opened_at is None:
+            return 'closed'
+        return 'open' if now - self.opened_at < cooldown else 'half_open'
+
+    def has_model(self, model):
+        """True/False once the backend's /api/tags has been read, None before that"""
+        return None if self.models is None else model in self.models
+
+
+class OllamaBackendRouter:
+    """Spreads Ollama traffic over one or more backends.
+
+    A request for a model goes to the backend with the fewest outstanding
+    requests among those whose /api/tags lists it, then to backends not
+    listed yet, and only then to backends known to lack it. Connection
+    errors, 5xx replies and "model not found" fail over to the next
+    candidate; a model's own 5xx (e.g. it failed to load) is not held
+    against the backend. After ``failureThreshold`` consecutive failures a backend's
+    circuit opens and it gets no traffic for ``cooldownSeconds``; then a
+    single trial request decides whether it closes again. If every circuit
+    is open, the backend that tripped first is still tried rather than
+    failing outright. Offers the same request/get_json/post_json interface
+    as OllamaConnectionPool.
+    """
+
+    def __init__(self, backends=None):
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        self.backends = []
+        self.size = DEFAULT_POOL_SIZE
+        self.idle_timeout = DEFAULT_POOL_IDLE_TIMEOUT
+        self.timeouts = None
+        self.configure(backends or [OLLAMA_URL])
+
+    @staticmethod
+    def parse_backends(entries):
+        """[(name, url)] from a list of URLs or {"name", "url"} objects"""
+        parsed = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            if not isinstance(entry, dict) or not entry.get('url'):
+                raise ValueError(f"Invalid Ollama backend: {entry!r}")
+            url = entry['url'].rstrip('/')
+            name = entry.get('name') or urllib.parse.urlsplit(url).netloc or url
+            if any(name == other for other, _ in parsed):
+                raise ValueError(f"Duplicate Ollama backend name: {name}")
+            parsed.append((name, url))
+        if not parsed:
+            raise ValueError("At least one Ollama backend is required")
+        return parsed
+
+    def configure(self, backends=None, size=None, idle_timeout=None, timeouts=None, breaker=None):
+        """Apply settings; backends keep their connections and stats if their URL is unchanged"""
+        if size is not None:
+            self.size = size
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        if timeouts is not None:
+            self.timeouts = timeouts
+        merged = dict(DEFAULT_CIRCUIT_BREAKER_SETTINGS)
+        merged.update(breaker or {})
+        with self._lock:
+            self.failure_threshold = max(1, int(merged['failureThreshold']))
+            self.cooldown = max(0.0, float(merged['cooldownSeconds']))
+            current = {b.url: b for b in self.backends}
+            if backends is not None:
+                updated = []
+                for name, url in self.parse_backends(backends):
+                    backend = current.pop(url, None) or OllamaBackend(name, url)
+                    backend.name = name
+                    updated.append(backend)
+                self.backends = updated
+            else:
+                current = {}
+            retired = list(current.values())
+            for backend in self.backends:
+                backend.pool.configure(size=self.size, idle_timeout=self.idle_timeout, timeouts=self.timeouts)
+        for backend in retired:
+            backend.pool.close()
+
+    @property
+    def base_url(self):
+        """URL of the first (primary) backend"""
+        return self.backends[0].url
+
+    def resolve_timeout(self, timeout):
+        return self.backends[0].pool.resolve_timeout(timeout)
+
+    def _targets(self, model=None):
+        """Backends whose circuit is not open, minus those known not to have ``model``"""
+        now = time.monotonic()
+        with self._lock:
+            targets = [b for b in self.backends if b.breaker_state(now, self.cooldown) != 'open']
+            if model:
+                targets = [b for b in targets if b.has_model(model) is not False]
+            return targets
+
+    def _candidates(self, model=None, backend=None):
+        """Backends to try, in order: those listing ``model``, then unlisted ones, then those known
+        to lack it; least outstanding first within each group"""
+        if backend is not None:
+            with self._lock:
+                return [b for b in self.backends if b.name == backend]
+        now = time.monotonic()
+        with self._lock:
+            usable = [b for b in self.backends if b.breaker_state(now, self.cooldown) != 'open']
+            if not usable:
+                usable = [min(self.backends, key=lambda b: b.opened_at)]
+            tier = {True: 0, None: 1, False: 2}
+            # Rotate the tie-break so equally loaded backends take turns
+            offset = next(self._rotation)
+            rank = {id(b): (i - offset) % len(self.backends) for i, b in enumerate(self.backends)}
+            return sorted(usable, key=lambda b: (tier[b.has_model(model)] if model else 0,
+                                                 b.outstanding, rank[id(b)]))
+
+    def _begin(self, backend):
+        """Count a request against ``backend``; a half-open circuit lets only one trial through"""
+        with self._lock:
+            if backend.breaker_state(time.monotonic(), self.cooldown) == 'half_open':
+                if backend.trial_running:
+                    return False
+                backend.trial_running = True
+            backend.outstanding += 1
+            backend.requests += 1
+            return True
+
+    def _release(self, backend):
+        with self._lock:
+            backend.outstanding -= 1
+
+    def _end_trial(self, backend):
+        """Let a half-open backend take another trial without judging this one"""
+        with self._lock:
+            backend.trial_running = False
+
+    def _record(self, backend, error=None):
+        """Feed a request outcome to the backend's circuit breaker"""
+        message = None
+        with self._lock:
+            backend.trial_running = False
+            if error is None:
+                if backend.opened_at is not None:
+                    message = f"✅ Ollama backend {backend.name} recovered, circuit closed"
+                backend.consecutive_failures = 0
+                backend.opened_at = None
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                backend.last_error = error
+                if backend.opened_at is not None or backend.consecutive_failures >= self.failure_threshold:
+                    backend.opened_at = time.monotonic()
+                    message = (f"⚠️ Ollama backend {backend.name} failing ({error}), "
+                               f"circuit open for {self.cooldown:g}s")
+        if message:
+            print(message)
+
+    @staticmethod
+    def _more_specific(error, previous):
+        """Prefer a backend's own reply (e.g. model not found) over a connection error"""
+        if isinstance(previous, urllib.error.HTTPError) and not isinstance(error, urllib.error.HTTPError):
+            return previous
+        return error
+
+    def request(self, method, path, body=None, timeout=None, headers=None, model=None, backend=None):
+        """Send a request to the best backend for ``model`` (or to the named ``backend``).
+
+        Fails over to the next candidate only when a backend could not be
+        reached, replied 5xx, or (for a model request) replied 404. A 5xx to
+        a model request only counts against the backend's circuit when it is
+        a gateway error (502/504); otherwise it is the model failing, not the
+        backend. A timeout waiting for the reply is raised straight away (the
+        backend is busy working on it, so it is neither retried elsewhere nor
+        counted against its circuit), as are other 4xx replies and errors
+        after the request was sent. When every candidate fails, a reply from a
+        backend is raised in preference to a connection error. The returned
+        PooledResponse has ``backend`` set to the name of the one that answered.
+        """
+        last_error = None
+        for candidate in self._candidates(ModelCatalog.normalize(model) if model else None, backend):
+            if not self._begin(candidate):
+                continue
+            try:
+                response = candidate.pool.request(method, path, body=body, timeout=timeout, headers=headers)
+            except UpstreamTimeout:
+                self._release(candidate)
+                self._end_trial(candidate)
+                raise
+            except urllib.error.HTTPError as e:
+                self._release(candidate)
+                if e.code >= 500 and (not model or e.code in (502, 504)):
+                    self._record(candidate, f"HTTP {e.code}")
+                else:
+                    self._record(candidate)
+                    if e.code < 500 and not (model and e.code == 404):
+                        raise
+                last_error = self._more_specific(e, last_error)
+                continue
+            except UpstreamConnectError as e:
+                self._release(candidate)
+                self._record(candidate, str(e.reason))
+                last_error = self._more_specific(e, last_error)
+                continue
+            except urllib.error.URLError as e:
+                self._release(candidate)
+                self._record(candidate, str(e.reason))
+                raise
+            self._record(candidate)
+            response.backend = candidate.name
+            response.on_close = lambda: self._release(candidate)
+            return response
+        raise last_error or urllib.error.URLError(f"No Ollama backend available for {model or path}")
+
+    def get_json(self, path, timeout=None, model=None, backend=None):
+        """GET a JSON document from the best backend"""
+        with self.request('GET', path, timeout=timeout, model=model, backend=backend) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def post_json(self, path, payload, timeout=None, method='POST', model=None, backend=None):
+        """Send a JSON payload to the best backend and decode the JSON reply"""
+        body = json.dumps(payload).encode('utf-8')
+        with self.request(method, path, body=body, timeout=timeout, model=model, backend=backend) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def gather(self, method, path, payload=None, timeout=None, model=None):
+        """Send the same request to every available backend (that may hold ``model``) in parallel.
+
+        Returns {backend name: decoded JSON reply, or {} if empty} for the
+        backends that answered; raises the last error if none did.
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        results, errors = {}, []
+
+        def call(target):
+            try:
+                with self.request(method, path, body=body, timeout=timeout, backend=target.name) as response:
+                    data = response.read()
+                results[target.name] = json.loads(data.decode('utf-8')) if data.strip() else {}
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                errors.append(e)
+
+        targets = self._targets(ModelCatalog.normalize(model) if model else None)
+        threads = [threading.Thread(target=call, args=(t,), name=f'ollama-{t.name}', daemon=True)
+                   for t in targets[1:]]
+        for thread in threads:
+            thread.start()
+        if targets:
+            call(targets[0])
+        for thread in threads:
+            thread.join()
+        if not results:
+            raise errors[-1] if errors else urllib.error.URLError(f"No Ollama backend available for {model or path}")
+        return results
+
+    def target_names(self):
+        """Names of the backends currently accepting traffic"""
+        return [b.name for b in self._targets()]
+
+    def list_models(self, timeout='tags'):
+        """/api/tags merged across backends; also records which backend has which model"""
+        replies = self.gather('GET', '/api/tags', timeout=timeout)
+        merged = {}
+        with self._lock:
+            for backend in self.backends:
+                if backend.name not in replies:
+                    continue
+                models = replies[backend.name].get('models', [])
+                backend.models = {ModelCatalog.normalize(m.get('name', '')) for m in models}
+                for model in models:
+                    entry = merged.setdefault(ModelCatalog.normalize(model.get('name', '')), dict(model, backends=[]))
+                    entry['backends'].append(backend.name)
+        return list(merged.values())
+
+    def running_models(self):
+        """/api/ps merged across backends: {normalized name: (ps entry, [backend names])}"""
+        running = {}
+        for name, data in self.gather('GET', '/api/ps', timeout='tags').items():
+            for model in data.get('models', []):
+                entry = running.setdefault(ModelCatalog.normalize(model.get('name') or model.get('model', '')),
+                                           (model, []))
+                if name not in entry[1]:
+                    entry[1].append(name)
+        return running
+
+    def capacity(self, model):
+        """How many available backends can serve ``model`` (at least 1)"""
+        return max(1, len(self._targets(model)))
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "name": b.name,
+                "url": b.url,
+                "circuit": b.breaker_state(now, self.cooldown),
+                "outstanding": b.outstanding,
+                "requests": b.requests,
+                "failures": b.failures,
+                "consecutive_failures": b.consecutive_failures,
+                "models": sorted(b.models) if b.models is not None else None,
+                "last_error": b.last_error
+            } for b in self.backends]
+
+    def prometheus_lines(self):
+        backends = self.status()
+        lines = ['# HELP santa_backend_up Whether the backend circuit is closed (1) or open/half-open (0)',
+                 '# TYPE santa_backend_up gauge']
+        lines += [f'santa_backend_up{{backend="{prometheus_label(b["name"])}"}} {int(b["circuit"] == "closed")}'
+                  for b in backends]
+        lines += ['# HELP santa_backend_outstanding Requests in flight to the backend',
+                  '# TYPE santa_backend_outstanding gauge']
+        lines += [f'santa_backend_outstanding{{backend="{prometheus_label(b["name"])}"}} {b["outstanding"]}'
+                  for b in backends]
+        lines += ['# HELP santa_backend_requests_total Requests sent to the backend',
+                  '# TYPE santa_backend_requests_total counter']
+        lines += [f'santa_backend_requests_total{{backend="{prometheus_label(b["name"])}"}} {b["requests"]}'
+                  for b in backends]
+        lines += ['# HELP santa_backend_failures_total Connection errors and 5xx replies from the backend',
+                  '# TYPE santa_backend_failures_total counter']
+        lines += [f'santa_backend_failures_total{{backend="{prometheus_label(b["name"])}"}} {b["failures"]}'
+                  for b in backends]
+        return lines
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            backends = list(self.backends)
+        for backend in backends:
+            backend.pool.close()
+
+
+ollama_backends = OllamaBackendRouter()
+
+
+class AdmissionRejected(Exception):
+    """A generation was shed because it could not start before its deadline"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-model concurrency limits and priority queueing in front of Ollama.
+
+    At most ``maxConcurrentPerModel`` generations (or the model's entry in
+    ``modelLimits``) run against a model on each backend serving it; the rest
+    wait in a queue where interactive requests always go before background
+    ones, and ``interactiveReserve`` slots are never given to background
+    work. Every request has a deadline to *start* by: if the queue ahead of
+    it already looks too long (from the model's average service time) it is
+    shed immediately, otherwise it is shed when the deadline passes.
+    """
+
+    def __init__(self, settings=None):
+        self._cond = threading.Condition()
+        self._models = {}
+        self._seq = itertools.count()
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.shed = {"deadline": 0, "timeout": 0, "queue_full": 0}
+        self._wait = {p: Histogram() for p in PRIORITIES}
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_ADMISSION_SETTINGS)
+        merged.update(settings or {})
+        deadlines = dict(DEFAULT_ADMISSION_SETTINGS['deadlineSeconds'])
+        deadlines.update(merged.get('deadlineSeconds') or {})
+        with self._cond:
+            self.enabled = bool(merged['enabled'])
+            self.max_concurrent = max(1, int(merged['maxConcurrentPerModel']))
+            self.model_limits = {ModelCatalog.normalize(name): max(1, int(limit))
+                                 for name, limit in (merged.get('modelLimits') or {}).items()}
+            self.interactive_reserve = max(0, int(merged['interactiveReserve']))
+            self.max_queued = max(0, int(merged['maxQueuedPerModel']))
+            self.deadlines = {p: max(0.1, float(deadlines[p])) for p in PRIORITIES}
+            self.retry_after = max(1, int(merged['retryAfterSeconds']))
+            self._cond.notify_all()
+
+    @staticmethod
+    def resolve_priority(value, default='interactive'):
+        value = (value or '').strip().lower()
+        return value if value in PRIORITIES else default
+
+    def deadline_after(self, seconds):
+        """Monotonic deadline ``seconds`` from now, clamped to the longest configured deadline"""
+        seconds = float(seconds)
+        if seconds != seconds:
+            raise ValueError("Deadline is not a number")
+        return time.monotonic() + min(max(0.0, seconds), max(self.deadlines.values()))
+
+    def max_wait(self):
+        """Longest any request may queue for a slot (0 when admission is off)"""
+        return max(self.deadlines.values()) if self.enabled else 0.0
+
+    def background_slots(self, model):
+        """How many generations of ``model`` background work may run at once"""
+        limit = self.limit_for(ModelCatalog.normalize(model or ''))
+        return limit - min(self.interactive_reserve, limit - 1)
+
+    def limit_for(self, model):
+        """Slots for ``model``: the per-backend limit times the backends that can serve it"""
+        return self.model_limits.get(model, self.max_concurrent) * ollama_backends.capacity(model)
+
+    def _state_locked(self, model):
+        state = self._models.get(model)
+        if state is None:
+            if len(self._models) >= MAX_METRIC_MODELS:
+                for name in [n for n, st in self._models.items() if not st['waiting'] and not any(st['active'].values())]:
+                    del self._models[name]
+            state = self._models[model] = {
+                "active": {p: 0 for p in PRIORITIES}, "waiting": [], "service_avg": None
+            }
+        return state
+
+    def _has_room(self, active, priority, limit):
+        if sum(active.values()) >= limit:
+            return False
+        if priority == 'background':
+            return active['background'] < limit - min(self.interactive_reserve, limit - 1)
+        return True
+
+    @staticmethod
+    def _order(ticket):
+        return PRIORITIES.index(ticket['priority']), ticket['seq']
+
+    def _may_start(self, state, ticket, limit):
+        """True if ``ticket`` is the first waiter, in priority order, that has a free slot"""
+        for candidate in sorted(state['waiting'], key=self._order):
+            if self._has_room(state['active'], candidate['priority'], limit):
+                return candidate is ticket
+        return False
+
+    def _estimate_wait(self, state, ticket, limit):
+        """Rough seconds until ``ticket`` gets a slot, from the model's average service time"""
+        if state['service_avg'] is None:
+            return 0.0
+        ahead = sum(1 for other in state['waiting'] if self._order(other) < self._order(ticket))
+        slots = limit if ticket['priority'] == 'interactive' else max(1, limit - min(self.interactive_reserve, limit - 1))
+        return (ahead + 1) / slots * state['service_avg']
+
+    def _reject_locked(self, state, ticket, reason, message):
+        state['waiting'].remove(ticket)
+        self.shed[reason] += 1
+        self._cond.notify_all()
+        raise AdmissionRejected(message, self.retry_after)
+
+    @contextlib.contextmanager
+    def admit(self, model, priority='interactive', deadline=None):
+        """Hold a generation slot for ``model``; yields the seconds spent queued.
+
+        ``deadline`` is a ``time.monotonic()`` value (default: now plus the
+        priority's ``deadlineSeconds``). Raises AdmissionRejected if the
+        request cannot start in time.
+        """
+        if not self.enabled:
+            yield 0.0
+            return
+        model = ModelCatalog.normalize(model or '')
+        priority = self.resolve_priority(priority)
+        queued_at = time.monotonic()
+        if deadline is None:
+            deadline = queued_at + self.deadlines[priority]
+
+        with self._cond:
+            state = self._state_locked(model)
+            ticket = {"priority": priority, "seq": next(self._seq)}
+            state['waiting'].append(ticket)
+            limit = self.limit_for(model)
+            if not self._may_start(state, ticket, limit):
+                if len(state['waiting']) > self.max_queued:
+                    self._reject_locked(state, ticket, 'queue_full',
+                                        f"Too many requests queued for {model}")
+                estimate = self._estimate_wait(state, ticket, limit)
+                if queued_at + estimate > deadline:
+                    self._reject_locked(state, ticket, 'deadline',
+                                        f"{model} is busy: estimated wait {estimate:.1f}s exceeds the "
+                                        f"{deadline - queued_at:.1f}s {priority} deadline")
+            while not self._may_start(state, ticket, limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject_locked(state, ticket, 'timeout',
+                                        f"{model} is busy: request could not start within "
+                                        f"{deadline - queued_at:.1f}s")
+                self._cond.wait(remaining)
+                limit = self.limit_for(model)
+            state['waiting'].remove(ticket)
+            state['active'][priority] += 1
+            waited = time.monotonic() - queued_at
+            self.admitted[priority] += 1
+            self._wait[priority].observe(waited)
+            self._cond.notify_all()
+
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            held = time.monotonic() - started
+            with self._cond:
+                state['active'][priority] -= 1
+                average = state['service_avg']
+                state['service_avg'] = held if average is None else 0.8 * average + 0.2 * held
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "max_concurrent_per_model": self.max_concurrent,
+                "interactive_reserve": self.interactive_reserve,
+                "deadline_seconds": dict(self.deadlines),
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+                "wait": {p: self._wait[p].to_dict() for p in PRIORITIES},
+                "models": {model: {
+                    "limit": self.limit_for(model),
+                    "active": dict(state['active']),
+                    "queued": {p: sum(1 for t in state['waiting'] if t['priority'] == p) for p in PRIORITIES},
+                    "avg_service_seconds": round(state['service_avg'], 3) if state['service_avg'] is not None else None
+                } for model, state in sorted(self._models.items())}
+            }
+
+    def prometheus_lines(self):
+        lines = ['# HELP santa_admission_queued Generations waiting for a model slot',
+                 '# TYPE santa_admission_queued gauge']
+        with self._cond:
+            models = sorted(self._models.items())
+            for model, state in models:
+                for p in PRIORITIES:
+                    queued = sum(1 for t in state['waiting'] if t['priority'] == p)
+                    lines.append(f'santa_admission_queued{{model="{prometheus_label(model)}",priority="{p}"}} {queued}')
+            lines += ['# HELP santa_admission_active Generations holding a model slot',
+                      '# TYPE santa_admission_active gauge']
+            for model, state in models:
+                for p in PRIORITIES:
+                    lines.append(f'santa_admission_active{{model="{prometheus_label(model)}",priority="{p}"}} {state["active"][p]}')
+            lines += ['# HELP santa_admission_shed_total Generations rejected before reaching Ollama',
+                      '# TYPE santa_admission_shed_total counter']
+            lines += [f'santa_admission_shed_total{{reason="{reason}"}} {n}' for reason, n in self.shed.items()]
+            lines += ['# HELP santa_admission_wait_seconds Time generations waited for a model slot',
+                      '# TYPE santa_admission_wait_seconds histogram']
+            for p in PRIORITIES:
+                lines += self._wait[p].prometheus_lines('santa_admission_wait_seconds', f'priority="{p}"')
+        return lines
+
+
+admission = AdmissionController()
+
+
+class GenerationCache:
+    """LRU cache of non-streaming /api/generate replies.
+
+    Keys are a hash of the model, prompt and options (everything except
+    ``stream``/``keep_alive``). Only deterministic requests (temperature 0 or
+    a fixed seed) are cached by default. With ``cacheNonDeterministic`` other
+    requests keep a pool of up to ``variants`` replies that are served
+    round-robin once the pool is full. Entries expire after ``ttlSeconds``
+    and the least recently used ones are evicted past ``maxEntries`` or
+    ``maxBytes``. The cache can be persisted to disk between restarts.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._persist_thread = None
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        """Apply settings from the "cache" config section"""
+        merged = dict(DEFAULT_CACHE_SETTINGS)
+        merged.update(settings or {})
+        with self._lock:
+            self.enabled = bool(merged['enabled'])
+            self.max_entries = max(1, int(merged['maxEntries']))
+            self.max_bytes = max(1, int(merged['maxBytes']))
+            self.ttl = float(merged['ttlSeconds'])
+            self.cache_non_deterministic = bool(merged['cacheNonDeterministic'])
+            self.variants = max(1, int(merged['variants']))
+            persist_path = merged.get('persistPath')
+            self.persist_path = (BASE_DIR / persist_path) if persist_path else None
+            self.persist_interval = float(merged['persistIntervalSeconds'])
+            self._evict_locked()
+
+    @staticmethod
+    def is_deterministic(request_json):
+        """Temperature 0 or a fixed seed makes Ollama's output repeatable"""
+        options = request_json.get('options') or {}
+        return options.get('temperature') == 0 or 'seed' in options
+
+    def make_key(self, request_json):
+        """Return (key, variant_target) for a cacheable request, or (None, 0)"""
+        if not self.enabled or not isinstance(request_json, dict):
+            return None, 0
+        if request_json.get('stream') is not False or not request_json.get('prompt'):
+            return None, 0
+        if self.is_deterministic(request_json):
+            target = 1
+        elif self.cache_non_deterministic:
+            target = self.variants
+        else:
+            return None, 0
+        material = {k: v for k, v in request_json.items() if k not in ('stream', 'keep_alive')}
+        digest = hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest(), target
+
+    def get(self, key):
+        """Return a cached body, or None if missing, expired or still filling its variant pool"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry['created'] > self.ttl:
+                self._remove_locked(key)
+                entry = None
+            if entry is None or len(entry['variants']) < entry['target']:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            body = entry['variants'][entry['next'] % len(entry['variants'])]
+            entry['next'] += 1
+            self.hits += 1
+            return body
+
+    def put(self, key, body, target=1):
+        """Store a reply (adds a variant until the entry's pool is full)"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry['created'] > self.ttl:
+                if entry is not None:
+                    self._remove_locked(key)
+                entry = {'variants': [], 'next': 0, 'created': time.time(), 'target': target, 'size': 0}
+                self._entries[key] = entry
+            if len(entry['variants']) < entry['target']:
+                entry['variants'].append(body)
+                entry['size'] += len(body)
+                self._bytes += len(body)
+            self._entries.move_to_end(key)
+            self._evict_locked()
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+
+    def _evict_locked(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove_locked(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def load(self):
+        """Load persisted entries, skipping expired ones"""
+        if not self.persist_path or not self.persist_path.exists():
+            return 0
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Failed to load generation cache: {e}")
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for item in saved.get('entries', []):
+                if now - item['created'] > self.ttl:
+                    continue
+                variants = [v.encode('utf-8') for v in item['variants']]
+                size = sum(len(v) for v in variants)
+                self._entries[item['key']] = {
+                    'variants': variants, 'next': 0, 'created': item['created'],
+                    'target': item.get('target', 1), 'size': size
+                }
+                self._bytes += size
+            self._evict_locked()
+            return len(self._entries)
+
+    def save(self):
+        """Write entries to disk atomically"""
+        if not self.enabled or not self.persist_path:
+            return
+        with self._lock:
+            entries = [
+                {'key': key, 'created': entry['created'], 'target': entry['target'],
+                 'variants': [v.decode('utf-8') for v in entry['variants']]}
+                for key, entry in self._entries.items()
+            ]
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'saved_at': time.time(), 'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"Failed to save generation cache: {e}")
+
+    def start_persistence(self):
+        """Load the on-disk cache and periodically write it back in the background"""
+        if not self.enabled or not self.persist_path or self._persist_thread:
+            return
+        loaded = self.load()
+        if loaded:
+            print(f"💾 Restored {loaded} cached generation(s) from {self.persist_path.name}")
+
+        # 0 or less turns periodic saves off; the cache is still written on shutdown
+        if self.persist_interval <= 0:
+            return
+
+        def persist_loop():
+            while True:
+                time.sleep(max(1.0, self.persist_interval))
+                self.save()
+
+        self._persist_thread = threading.Thread(target=persist_loop, name='cache-persist', daemon=True)
+        self._persist_thread.start()
+
+
+generation_cache = GenerationCache()
+
+
+class InFlightRequest:
+    """Upstream reply shared between a leader request and its coalesced followers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._chunks = []
+        self._done = False
+        self._error = None
+
+    def publish(self, chunk):
+        """Append a chunk (a streamed line, or the whole buffered body)"""
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def _wait(self, predicate, timeout):
+        if not self._cond.wait_for(predicate, timeout):
+            raise TimeoutError("Timed out waiting for coalesced request")
+
+    def wait_started(self, timeout=None):
+        """Block until the first chunk arrives; re-raises the leader's error if it failed first"""
+        with self._cond:
+            self._wait(lambda: self._chunks or self._done, timeout)
+            if not self._chunks and self._error is not None:
+                raise self._error
+
+    def result(self, timeout=None):
+        """Block until the leader finishes and return the full body"""
+        with self._cond:
+            self._wait(lambda: self._done, timeout)
+            if self._error is not None and not self._chunks:
+                raise self._error
+            return b''.join(self._chunks)
+
+    def iter_chunks(self, timeout=None):
+        """Yield chunks from the beginning, waiting for new ones until the leader finishes"""
+        index = 0
+        while True:
+            with self._cond:
+                self._wait(lambda: index < len(self._chunks) or self._done, timeout)
+                pending = self._chunks[index:]
+                finished = self._done
+                error = self._error
+            for chunk in pending:
+                yield chunk
+            index += len(pending)
+            if finished and not pending:
+                if error is not None:
+                    raise error
+                return
+
+
+class RequestCoalescer:
+    """Single-flight layer: identical concurrent generate requests share one upstream call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(request_json):
+        """Identity of a generate request (model, prompt, options, stream mode)"""
+        if not isinstance(request_json, dict) or not request_json.get('prompt'):
+            return None
+        material = {k: v for k, v in request_json.items() if k != 'keep_alive'}
+        material['stream'] = request_json.get('stream') is True
+        digest = hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def join(self, key):
+        """Return (flight, is_leader); the leader must call complete() when done"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = InFlightRequest()
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def complete(self, key, flight, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def in_flight_count(self):
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "upstream_calls": self.leaders, "coalesced": self.coalesced}
+
+
+request_coalescer = RequestCoalescer()
+
+
+class ConfigStore:
+    """Parsed santa-config.json kept in memory.
+
+    The file is re-read only when its mtime or size changes. Writes are
+    serialized with a lock and go through a temp file + rename, so readers
+    never see a half-written file. ``version`` is a content hash used as the
+    ETag for /api/config.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._config = None
+        self._stamp = None
+        self.version = None
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _refresh_locked(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        self._config, self._stamp, self.version = None, stamp, None
+        if stamp is None:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            self._config = json.loads(raw.decode('utf-8'))
+            self.version = hashlib.sha1(raw).hexdigest()[:16]
+            self.reloads += 1
+        except Exception as e:
+            print(f"Failed to load config: {e}")
+
+    def snapshot(self):
+        """Return (config copy, version), or (None, None) if the file is missing or invalid"""
+        with self._lock:
+            self._refresh_locked()
+            if self._config is None:
+                return None, None
+            return copy.deepcopy(self._config), self.version
+
+    def current_version(self):
+        """Version of the file on disk without copying the config"""
+        with self._lock:
+            self._refresh_locked()
+            return self.version
+
+    def save(self, config):
+        """Atomically replace the config file and the in-memory copy"""
+        raw = json.dumps(config, indent=2).encode('utf-8')
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{self.path.name}.", dir=self.path.parent)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(raw)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._config = copy.deepcopy(config)
+            self._stamp = self._file_stamp()
+            self.version = hashlib.sha1(raw).hexdigest()[:16]
+
+    def update(self, mutator, default_factory):
+        """Read-modify-write under the lock; ``mutator`` edits the config in place"""
+        with self._lock:
+            self._refresh_locked()
+            config = copy.deepcopy(self._config) if self._config is not None else default_factory()
+            mutator(config)
+            self.save(config)
+            return config
+
+
+config_store = ConfigStore(CONFIG_FILE)
+
+
+class ModelCatalog:
+    """Cached copy of Ollama's /api/tags with stale-while-revalidate refresh.
+
+    Fresh data is served for ``ttl`` seconds. After that the cached list is
+    still returned immediately while a single background refresh runs. If
+    Ollama is unreachable the last good list is served for up to
+    ``max_stale`` seconds. Lookups go through a name index that treats
+    ``llama3`` and ``llama3:latest`` as the same model.
+    """
+
+    def __init__(self, ttl=DEFAULT_CATALOG_TTL, max_stale=DEFAULT_CATALOG_MAX_STALE):
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._models = []
+        self._by_name = {}
+        self._by_base = {}
+        self._fetched_at = None
+        self._refreshing = False
+        self.last_error = None
+        self.configure(ttl, max_stale)
+
+    def configure(self, ttl=None, max_stale=None):
+        if ttl is not None:
+            self.ttl = float(ttl)
+        if max_stale is not None:
+            self.max_stale = float(max_stale)
+
+    @staticmethod
+    def normalize(name):
+        """Canonical ``name:tag`` form (Ollama's implicit tag is ``latest``)"""
+        name = (name or '').strip()
+        return name if ':' in name else f"{name}:latest"
+
+    def _age(self):
+        return None if self._fetched_at is None else time.monotonic() - self._fetched_at
+
+    def refresh(self):
+        """Fetch /api/tags now; keeps the previous list on failure. Returns True on success"""
+        with self._fetch_lock:
+            try:
+                models = ollama_backends.list_models()
+            except Exception as e:
+                with self._lock:
+                    self.last_error = str(e)
+                print(f"Failed to get Ollama models: {e}")
+                return False
+
+            by_name, by_base = {}, {}
+            for model in models:
+                full_name = self.normalize(model.get('name', ''))
+                by_name[full_name] = model
+                by_base.setdefault(full_name.split(':')[0], model)
+            with self._lock:
+                self._models = models
+                self._by_name = by_name
+                self._by_base = by_base
+                self._fetched_at = time.monotonic()
+                self.last_error = None
+            return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='catalog-refresh', daemon=True).start()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            age = self._age()
+        if age is None:
+            self.refresh()
+        elif age > self.ttl:
+            self._refresh_in_background()
+
+    def models(self):
+        """Installed models, served from cache (empty if nothing usable is cached)"""
+        self._ensure_loaded()
+        with self._lock:
+            age = self._age()
+            if age is None or (self.last_error and age > self.max_stale):
+                return []
+            return list(self._models)
+
+    def find(self, name, refresh_on_miss=True):
+        """Look up a model by ``name``, ``name:tag`` or bare base name in O(1)"""
+        self._ensure_loaded()
+        model = self._lookup(name)
+        if model is None and refresh_on_miss:
+            # The model may have been pulled outside the tracker since the last refresh
+            self.refresh()
+            model = self._lookup(name)
+        return model
+
+    def _lookup(self, name):
+        full_name = self.normalize(name)
+        with self._lock:
+            model = self._by_name.get(full_name)
+            if model is None and ':' not in (name or ''):
+                model = self._by_base.get(full_name.split(':')[0])
+            return model
+
+    def invalidate(self):
+        """Drop freshness after a pull/delete and refresh in the background"""
+        with self._lock:
+            if self._fetched_at is not None:
+                self._fetched_at = time.monotonic() - self.ttl - 1
+        self._refresh_in_background()
+
+    def status(self):
+        with self._lock:
+            age = self._age()
+            return {
+                "models": len(self._models),
+                "age_seconds": round(age, 1) if age is not None else None,
+                "ttl_seconds": self.ttl,
+                "stale": age is None or age > self.ttl,
+                "refreshing": self._refreshing,
+                "last_error": self.last_error
+            }
+
+
+model_catalog = ModelCatalog()
+
+
+class ModelHealthMonitor:
+    """Background health probes for installed models.
+
+    Probes run on a schedule with at most ``maxParallel`` at a time, and the
+    HTTP endpoint only reads the last results. With ``loadedOnly`` only
+    models already resident in Ollama (/api/ps) are probed, so a check never
+    forces a model into memory and evicts the one in production use.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._results = {}
+        self._running = False
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_HEALTH_SETTINGS)
+        merged.update(settings or {})
+        self.enabled = bool(merged['enabled'])
+        self.interval = max(1.0, float(merged['intervalSeconds']))
+        self.max_parallel = max(1, int(merged['maxParallel']))
+        self.loaded_only = bool(merged['loadedOnly'])
+
+    @staticmethod
+    def loaded_models():
+        """Normalized names of models currently resident in Ollama"""
+        return set(ollama_backends.running_models())
+
+    @staticmethod
+    def probe(model):
+        """Generate a single token with ``model`` and time it"""
+        model_name = model['name']
+        started = time.monotonic()
+        result = {
+            "name": model_name, "size": model.get('size', 0),
+            "modified_at": model.get('modified_at', '')
+        }
+        try:
+            test_data = {"model": model_name, "prompt": "Test", "stream": False, "options": {"num_predict": 1}}
+            with admission.admit(model_name, 'background'):
+                data = ollama_backends.post_json('/api/generate', test_data, timeout='health', model=model_name)
+            result["healthy"] = 'response' in data
+            if 'load_duration' in data:
+                result["load_ms"] = round(data['load_duration'] / 1e6, 1)
+        except AdmissionRejected as e:
+            # The model is busy serving users; keep its previous result
+            result["skipped"] = str(e)
+        except Exception as e:
+            result["healthy"] = False
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        result["last_checked"] = time.time()
+        return result
+
+    def run_checks(self, loaded_only=None):
+        """Probe models now; returns False if a run is already in progress"""
+        loaded_only = self.loaded_only if loaded_only is None else loaded_only
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+
+        started_at = time.time()
+        error = None
+        checked = 0
+        try:
+            models = model_catalog.models()
+            loaded = set()
+            try:
+                loaded = self.loaded_models()
+            except Exception as e:
+                if loaded_only:
+                    raise RuntimeError(f"Cannot list loaded models: {e}")
+            if loaded_only:
+                models = [m for m in models if ModelCatalog.normalize(m['name']) in loaded]
+
+            for model, result, _ in run_bounded(self.probe, models, self.max_parallel):
+                if result.get("skipped"):
+                    continue
+                result["loaded"] = True if loaded_only else ModelCatalog.normalize(model['name']) in loaded
+                with self._lock:
+                    self._results[model['name']] = result
+                checked += 1
+
+            installed = {m['name'] for m in model_catalog.models()}
+            with self._lock:
+                for name in list(self._results):
+                    if name not in installed:
+                        del self._results[name]
+        except Exception as e:
+            error = str(e)
+            print(f"Model health check failed: {e}")
+        finally:
+            finished_at = time.time()
+            with self._lock:
+                self._running = False
+                self.last_run = {
+                    "started_at": started_at, "finished_at": finished_at,
+                    "duration_ms": round((finished_at - started_at) * 1000, 1),
+                    "checked": checked, "loaded_only": loaded_only, "error": error
+                }
+        return True
+
+    def trigger(self, loaded_only=None):
+        """Start a run in the background"""
+        threading.Thread(target=self.run_checks, args=(loaded_only,), name='health-run', daemon=True).start()
+
+    def start(self):
+        """Run checks on the configured schedule"""
+        if not self.enabled or self._thread:
+            return
+
+        def loop():
+            while True:
+                self.run_checks()
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=loop, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def wait_idle(self, timeout):
+        """Block until no run is in progress (or ``timeout`` elapses)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._running:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "models": sorted(self._results.values(), key=lambda r: r['name']),
+                "running": self._running,
+                "last_run": dict(self.last_run) if self.last_run else None,
+                "interval_seconds": self.interval,
+                "max_parallel": self.max_parallel,
+                "loaded_only": self.loaded_only
+            }
+
+
+health_monitor = ModelHealthMonitor()
+
+
+class ModelWarmer:
+    """Keeps the active model loaded in Ollama.
+
+    At startup and whenever ``aiProvider.defaultModel`` changes, the new
+    model is loaded in the background with an empty prompt so the first real
+    request doesn't pay the load time. Proxied requests for the active model
+    get ``keepAlive`` unless the client set ``keep_alive`` itself. With
+    ``unloadInactive``, resident models nothing is configured to use are
+    unloaded after a switch to free memory.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._states = {}
+        self._events = {}
+        self.active_model = None
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_WARMUP_SETTINGS)
+        merged.update(settings or {})
+        self.enabled = bool(merged['enabled'])
+        self.on_startup = bool(merged['onStartup'])
+        self.on_switch = bool(merged['onSwitch'])
+        self.keep_alive = merged['keepAlive']
+        self.unload_inactive = bool(merged['unloadInactive'])
+        self.wait_timeout = max(1.0, float(merged['waitTimeoutSeconds']))
+
+    @staticmethod
+    def models_in_use(config):
+        """Normalized names of every model the configuration points at"""
+        models = {ModelCatalog.normalize(config.get('aiProvider', {}).get('defaultModel', ''))}
+        language_models = config.get('messagePool', {}).get('languageModels') or {}
+        models.update(ModelCatalog.normalize(name) for name in language_models.values() if name)
+        models.discard('')
+        return models
+
+    def start(self, config):
+        """Adopt the configured model at startup, warming it if enabled"""
+        self.active_model = ModelCatalog.normalize(config.get('aiProvider', {}).get('defaultModel', '')) or None
+        if self.active_model and self.enabled and self.on_startup:
+            self.warm(self.active_model)
+
+    def follow_config(self, config):
+        """Warm the new default model after a switch; returns its warm-up state"""
+        model = ModelCatalog.normalize(config.get('aiProvider', {}).get('defaultModel', '')) or None
+        if not model or model == self.active_model:
+            return self.state(model)
+        previous, self.active_model = self.active_model, model
+        if not self.enabled or not self.on_switch:
+            return self.state(model)
+        self.warm(model, unload_after=self.models_in_use(config) if self.unload_inactive else None)
+        if previous:
+            print(f"🔥 Switched from {previous}, warming up {model}")
+        return self.state(model)
+
+    def warm(self, model, unload_after=None):
+        """Load ``model`` in the background; returns an Event set when it is done"""
+        with self._lock:
+            event = self._events.get(model)
+            if event is not None:
+                return event
+            event = self._events[model] = threading.Event()
+            self._states[model] = {"state": "warming", "started_at": time.time()}
+        threading.Thread(target=self._warm, args=(model, event, unload_after),
+                         name=f'warmup-{model}', daemon=True).start()
+        return event
+
+    def _warm(self, model, event, unload_after):
+        started = time.monotonic()
+        try:
+            # Load it on every backend that has it, so routing can pick any of them
+            ollama_backends.gather('POST', '/api/generate', {"model": model, "prompt": "", "keep_alive": self.keep_alive},
+                                   timeout='generate', model=model)
+            state = {"state": "warm", "load_seconds": round(time.monotonic() - started, 2)}
+            try:
+                state["resident"] = model in {m['name'] for m in self.resident_models()}
+            except (urllib.error.URLError, OSError, ValueError):
+                pass
+            print(f"🔥 Model {model} warmed up in {state['load_seconds']}s")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            state = {"state": "failed", "error": str(e)}
+            print(f"⚠️ Warm-up of {model} failed: {e}")
+        state["finished_at"] = time.time()
+        with self._lock:
+            self._states[model] = dict(self._states.get(model, {}), **state)
+            self._events.pop(model, None)
+        event.set()
+        if unload_after is not None and state["state"] == "warm":
+            self.unload_unused(unload_after)
+
+    def wait(self, model, timeout=None):
+        """Block until a running warm-up of ``model`` finishes; returns its state"""
+        with self._lock:
+            event = self._events.get(model)
+        if event is not None:
+            event.wait(self.wait_timeout if timeout is None else timeout)
+        return self.state(model)
+
+    def state(self, model):
+        with self._lock:
+            return dict(self._states.get(model) or {"state": "cold"})
+
+    def keep_alive_for(self, model):
+        """``keep_alive`` to add to a request for ``model``, or None"""
+        if self.enabled and self.keep_alive is not None and ModelCatalog.normalize(model or '') == self.active_model:
+            return self.keep_alive
+        return None
+
+    @staticmethod
+    def resident_models():
+        """Models currently loaded in Ollama (/api/ps on every backend)"""
+        return [{
+            "name": name,
+            "size_vram": m.get('size_vram', 0),
+            "expires_at": m.get('expires_at'),
+            "backends": backends
+        } for name, (m, backends) in ollama_backends.running_models().items()]
+
+    @staticmethod
+    def unload(model):
+        """Ask every backend holding ``model`` to drop it from memory now"""
+        ollama_backends.gather('POST', '/api/generate', {"model": model, "keep_alive": 0}, timeout='generate', model=model)
+
+    def unload_unused(self, keep):
+        """Unload every resident model not in ``keep``; returns the names unloaded"""
+        unloaded = []
+        try:
+            resident = self.resident_models()
+        except (urllib.error.URLError, OSError, ValueError):
+            return unloaded
+        for model in resident:
+            if model['name'] in keep or model['name'] == self.active_model:
+                continue
+            try:
+                self.unload(model['name'])
+                unloaded.append(model['name'])
+                print(f"🧊 Unloaded inactive model {model['name']}")
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                print(f"⚠️ Could not unload {model['name']}: {e}")
+        return unloaded
+
+    def status(self):
+        with self._lock:
+            models = {name: dict(state) for name, state in self._states.items()}
+        status = {
+            "enabled": self.enabled,
+            "active_model": self.active_model,
+            "keep_alive": self.keep_alive,
+            "unload_inactive": self.unload_inactive,
+            "models": models
+        }
+        try:
+            status["resident"] = self.resident_models()
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            status["resident"] = None
+            status["resident_error"] = str(e)
+        return status
+
+
+model_warmer = ModelWarmer()
+
+
+class PullJob:
+    """State of one model pull, aggregated across the layers each backend reports"""
+
+    def __init__(self, model):
+        self.id = uuid.uuid4().hex[:12]
+        self.model = model
+        self.state = 'queued'
+        self.status = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rate_bps = 0.0
+        self.layers = {}
+        self.version = 0
+        self._last_sample = None
+
+    @property
+    def finished(self):
+        return self.state in ('success', 'error')
+
+    def progress(self, backend=None):
+        layers = [layer for (name, _), layer in self.layers.items() if backend is None or name == backend]
+        completed = sum(done for done, _ in layers)
+        total = sum(size for _, size in layers)
+        return completed, total
+
+    def apply_update(self, update, now, backend=None):
+        """Fold one NDJSON progress line from ``backend`` into the job state"""
+        if 'error' in update:
+            raise RuntimeError(update['error'])
+        self.status = update.get('status', self.status)
+        digest = update.get('digest')
+        if digest and 'total' in update:
+            # Every backend downloads the same layers, so key them by backend as well
+            self.layers[(backend, digest)] = (update.get('completed', 0), update['total'])
+
+        completed, _ = self.progress()
+        if self._last_sample is not None:
+            last_time, last_completed = self._last_sample
+            elapsed = now - last_time
+            if elapsed >= 0.5:
+                instant = max(0, completed - last_completed) / elapsed
+                # Smooth the rate so ETA doesn't jump around between layers
+                self.rate_bps = instant if not self.rate_bps else 0.7 * self.rate_bps + 0.3 * instant
+                self._last_sample = (now, completed)
+        else:
+            self._last_sample = (now, completed)
+
+    def to_dict(self):
+        completed, total = self.progress()
+        remaining = max(0, total - completed)
+        return {
+            "job_id": self.id,
+            "model": self.model,
+            "state": self.state,
+            "status": self.status,
+            "completed": completed,
+            "total": total,
+            "percent": round(completed * 100 / total, 1) if total else None,
+            "rate_bps": round(self.rate_bps),
+            "eta_seconds": round(remaining / self.rate_bps) if self.rate_bps and total else None,
+            "backends": {name: dict(zip(("completed", "total"), self.progress(name)))
+                         for name in sorted({name for name, _ in self.layers}, key=str)},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class PullJobManager:
+    """Registry of model pulls with deduplication and a cap on simultaneous downloads.
+
+    Each pull gets a job ID. A second request for a model that is already
+    queued or downloading returns the existing job. Subscribers can wait for
+    progress updates to stream them to the UI.
+    """
+
+    def __init__(self, settings=None):
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._slots = None
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_PULL_SETTINGS)
+        merged.update(settings or {})
+        self.max_concurrent = max(1, int(merged['maxConcurrentPulls']))
+        self.retention = float(merged['jobRetentionSeconds'])
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    def start_pull(self, model):
+        """Return (job, created); reuses an active job for the same model"""
+        key = ModelCatalog.normalize(model)
+        with self._cond:
+            self._prune_locked()
+            for job in self._jobs.values():
+                if not job.finished and ModelCatalog.normalize(job.model) == key:
+                    return job, False
+            job = PullJob(model)
+            self._jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job,), name=f'pull-{job.id}', daemon=True).start()
+        return job, True
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _publish(self, job, **changes):
+        with self._cond:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._cond.notify_all()
+
+    def _run(self, job):
+        with self._slots:
+            self._publish(job, state='pulling', status='starting', started_at=time.time())
+            print(f"Starting pull for model: {job.model}")
+            try:
+                # Pull onto every backend at once so routing can send the model anywhere
+                backends = ollama_backends.target_names()
+                if not backends:
+                    raise RuntimeError("No Ollama backend available")
+                failed = []
+
+                def pull(backend):
+                    try:
+                        self._pull_from(job, backend)
+                    except (urllib.error.URLError, OSError, RuntimeError) as e:
+                        failed.append(f"{backend}: {e}")
+
+                threads = [threading.Thread(target=pull, args=(backend,), name=f'pull-{job.id}-{backend}',
+                                            daemon=True) for backend in backends[1:]]
+                for thread in threads:
+                    thread.start()
+                pull(backends[0])
+                for thread in threads:
+                    thread.join()
+                if failed:
+                    raise RuntimeError('; '.join(failed))
+                self._publish(job, state='success', status='success', finished_at=time.time())
+                print(f"Successfully pulled model: {job.model}")
+            except Exception as e:
+                self._publish(job, state='error', error=str(e), finished_at=time.time())
+                print(f"Failed to pull model {job.model}: {e}")
+            finally:
+                model_catalog.invalidate()
+
+    def _pull_from(self, job, backend):
+        req_data = json.dumps({"name": job.model}).encode('utf-8')
+        last_status = None
+        with ollama_backends.request('POST', '/api/pull', body=req_data, timeout='pull', backend=backend) as response:
+            # readline() frames NDJSON correctly even when a line spans several reads
+            for line in response:
+                if not line.strip():
+                    continue
+                try:
+                    update = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    continue
+                with self._cond:
+                    job.apply_update(update, time.monotonic(), backend)
+                    job.version += 1
+                    self._cond.notify_all()
+                if job.status != last_status:
+                    print(f"Pull progress ({job.model} on {backend}): {job.status}")
+                    last_status = job.status
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        with self._cond:
+            self._prune_locked()
+            return [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.created_at)]
+
+    def wait_for_update(self, job_id, last_version, timeout):
+        """Block until the job changes past ``last_version``; returns (snapshot, version) or (None, None)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            self._cond.wait_for(lambda: job.version != last_version or job.finished, timeout)
+            return job.to_dict(), job.version
+
+
+pull_manager = PullJobManager()
+
+
+class StaticAsset:
+    """One static file held in memory with its precompressed variants"""
+
+    def __init__(self, path, stamp, body, content_type, cache_control):
+        self.path = path
+        self.stamp = stamp
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.last_modified = email.utils.formatdate(stamp[0] / 1e9, usegmt=True)
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(body) > 1024:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = (compressed, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(body)
+                if len(compressed) < len(body):
+                    self.variants['br'] = (compressed, f'"{digest}-br"')
+
+    def etags(self):
+        return [etag for _, etag in self.variants.values()]
+
+    def choose(self, accept_encoding):
+        """Pick the smallest variant the client accepts; returns (encoding, body, etag)"""
+        accepted = set()
+        for token in (accept_encoding or '').split(','):
+            name, _, params = token.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(name.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                body, etag = self.variants[encoding]
+                return encoding, body, etag
+        body, etag = self.variants['identity']
+        return 'identity', body, etag
+
+
+class StaticAssetCache:
+    """In-memory cache of static files with gzip/brotli variants and strong ETags.
+
+    Files are loaded on first request and reloaded when their mtime or size
+    changes, so edits show up without a restart.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._assets = {}
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_STATIC_SETTINGS)
+        merged.update(settings or {})
+        self.enabled = bool(merged['enabled'])
+        self.max_file_bytes = int(merged['maxFileBytes'])
+        self.cache_control = merged['cacheControl']
+        self.cache_control_by_extension = {ext.lower(): value for ext, value
+                                           in (merged.get('cacheControlByExtension') or {}).items()}
+        with self._lock:
+            self._assets.clear()
+
+    def get(self, path):
+        """Return the StaticAsset for ``path``, or None if it should be served from disk"""
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path) or stat.st_size > self.max_file_bytes:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            asset = self._assets.get(path)
+        if asset is not None and asset.stamp == stamp:
+            return asset
+
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        extension = os.path.splitext(path)[1].lower()
+        cache_control = self.cache_control_by_extension.get(extension, self.cache_control)
+        asset = StaticAsset(path, stamp, body, content_type, cache_control)
+        with self._lock:
+            self._assets[path] = asset
+        return asset
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._assets),
+                "bytes": sum(len(body) for asset in self._assets.values() for body, _ in asset.variants.values()),
+                "brotli": brotli is not None
+            }
+
+
+static_cache = StaticAssetCache()
+
+
+def generate_text(model, prompt, options=None, timeout='generate', priority='interactive'):
+    """Run a non-streaming generation and return the cleaned response text"""
+    payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+    keep_alive = model_warmer.keep_alive_for(model)
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    with admission.admit(model, priority):
+        started = time.monotonic()
+        try:
+            data = ollama_backends.post_json('/api/generate', payload, timeout=timeout, model=model)
+        except Exception:
+            metrics.record_generation(model, time.monotonic() - started, error=True)
+            raise
+        metrics.record_generation(model, time.monotonic() - started, data)
+    # Thinking models (e.g. qwen3) prefix their answer with a <think> block
+    return re.sub(r'<think>.*?</think>', '', data.get('response', ''), flags=re.DOTALL).strip()
+
+
+def model_parameters(config, model_name):
+    """Generation options configured for ``model_name`` in aiProvider.availableModels"""
+    target = ModelCatalog.normalize(model_name)
+    for model in config.get('aiProvider', {}).get('availableModels', []):
+        if ModelCatalog.normalize(model.get('name')) == target:
+            return dict(model.get('parameters', {}))
+    return {}
+
+
+def render_member_prompt(family_data, member, language='en'):
+    """Build a personalized Santa prompt for one member of a family file"""
+    family = family_data.get('family', {})
+    location = family_data.get('location', {})
+    name = member.get('name', '')
+    interests = ', '.join(member.get('interests', []))
+
+    if language == 'ko':
+        parts = [f"당신은 산타클로스입니다! {family.get('lastName', '')} 가족의 {name}에게 보내는 "
+                 "따뜻하고 즐거운 크리스마스 메시지를 2-3문장으로 작성해주세요."]
+        if member.get('age'):
+            parts.append(f"나이: {member['age']}세.")
+        if member.get('role'):
+            parts.append(f"가족 안에서의 역할: {member['role']}.")
+        if location.get('city'):
+            parts.append(f"사는 곳: {location.get('state', '')} {location['city']}.")
+        if interests:
+            parts.append(f"좋아하는 것: {interests}.")
+        if member.get('behavior'):
+            parts.append(f"올해의 행동: {member['behavior']}.")
+        if member.get('specialNotes'):
+            parts.append(f"산타만 아는 사실: {member['specialNotes']}.")
+        parts.append("이 정보를 받았다고 언급하지 말고, 한국어로만 작성해주세요:")
+    else:
+        description = name
+        if member.get('age'):
+            description += f", age {member['age']}"
+        if member.get('role'):
+            description += f", the family's {member['role']}"
+        parts = [f"You are Santa Claus! Write a cheerful, warm, personal Christmas message (2-3 sentences max) "
+                 f"for {description}, of the {family.get('lastName', '')} family."]
+        if location.get('city'):
+            parts.append(f"They live in {location['city']}, {location.get('state', '')}.".replace(', .', '.'))
+        if interests:
+            parts.append(f"They love {interests}.")
+        if member.get('behavior'):
+            parts.append(f"This year their behavior has been {member['behavior']}.")
+        if member.get('specialNotes'):
+            parts.append(f"Something only Santa knows about them: {member['specialNotes']}.")
+        parts.append("Do not mention that you were given this information. Be jolly, keep it magical and brief. "
+                     "Use emojis sparingly (1-2 max). Don't use quotation marks.")
+    return ' '.join(parts)
+
+
+def load_family_file(file_name):
+    """Load a family JSON file that sits next to server.py (no paths allowed)"""
+    if not file_name or Path(file_name).name != file_name or not file_name.endswith('.json'):
+        raise ValueError("familyFile must be the name of a .json file in the tracker directory")
+    path = BASE_DIR / file_name
+    if not path.is_file():
+        raise FileNotFoundError(f"Family file '{file_name}' not found")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class SantaMessagePool:
+    """Pre-generated Santa messages per (phase, language, model, context bucket).
+
+    A background worker keeps each requested pool topped up to ``size``
+    messages, using Ollama only while no interactive generation is in flight
+    (``idleOnly``). ``take()`` pops a ready message instantly and falls back
+    to a live generation when the pool is empty. Distance and gift counts
+    are bucketed so a handful of pools cover every delivering-phase request.
+    """
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self.served_from_pool = 0
+        self.served_live = 0
+        self.generated = 0
+        self.failures = 0
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_MESSAGE_POOL_SETTINGS)
+        merged.update(settings or {})
+        self.enabled = bool(merged['enabled'])
+        self.size = max(1, int(merged['size']))
+        self.refill_interval = max(0.5, float(merged['refillIntervalSeconds']))
+        self.max_age = float(merged['maxAgeSeconds'])
+        self.idle_only = bool(merged['idleOnly'])
+        self.languages = list(merged['languages'])
+        self.language_models = dict(merged.get('languageModels') or {})
+
+    @staticmethod
+    def bucket(value, buckets):
+        """Return the bucket row for ``value`` (None when no value was given)"""
+        if value is None:
+            return None
+        for limit, *row in buckets:
+            if limit is None or value < limit:
+                return row
+        return None
+
+    def resolve_key(self, config, phase, language, model=None, distance=None, gifts=None):
+        """Normalize request parameters into a pool key"""
+        if phase not in SANTA_PHASES:
+            raise ValueError(f"Unknown phase '{phase}'")
+        language = 'ko' if language == 'ko' else 'en'
+        if not model:
+            model = self.language_models.get(language) or config.get('aiProvider', {}).get('defaultModel', '')
+        distance_bucket = gifts_bucket = '-'
+        if phase == 'delivering':
+            distance_row = self.bucket(distance, DISTANCE_BUCKETS)
+            gifts_row = self.bucket(gifts, GIFT_BUCKETS)
+            distance_bucket = distance_row[0] if distance_row else 'unknown'
+            gifts_bucket = gifts_row[0] if gifts_row else 'unknown'
+        return (phase, language, model, distance_bucket, gifts_bucket)
+
+    @staticmethod
+    def render_prompt(config, key):
+        """Build the prompt for a pool key from the configured phase templates"""
+        phase, language, _, distance_bucket, gifts_bucket = key
+        column = 3 if language == 'ko' else 2
+        distance_text = next((row[column] for row in DISTANCE_BUCKETS if row[1] == distance_bucket),
+                             '전 세계를 돌아다니고 있습니다.' if language == 'ko' else 'He is making his way across the globe.')
+        gifts_text = next((row[column] for row in GIFT_BUCKETS if row[1] == gifts_bucket), '')
+
+        if language == 'ko':
+            context = KOREAN_PHASE_CONTEXT[phase]
+            template = f"당신은 산타클로스입니다. 다음 상황에 대해 따뜻하고 즐거운 한국어 메시지를 2-3문장으로 작성해주세요:\n\n{context}\n\n한국어로만 작성해주세요:"
+        else:
+            template = config.get('prompts', {}).get(phase, '')
+        prompt = template.replace('{{DISTANCE_CONTEXT}}', distance_text).replace('{{GIFTS_CONTEXT}}', gifts_text)
+        return re.sub(r' {2,}', ' ', prompt).strip()
+
+    def _pool_locked(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = {'messages': deque(), 'last_requested': time.time(), 'failures': 0, 'retry_at': 0.0}
+            self._pools[key] = pool
+        return pool
+
+    def take(self, config, key):
+        """Return (message, source); generates live if the pool is empty or disabled"""
+        _, _, model, _, _ = key
+        if not self.enabled:
+            message = generate_text(model, self.render_prompt(config, key), model_parameters(config, model))
+            with self._lock:
+                self.served_live += 1
+            return message, 'live'
+
+        now = time.time()
+        with self._lock:
+            pool = self._pool_locked(key)
+            pool['last_requested'] = now
+            while pool['messages'] and now - pool['messages'][0][0] > self.max_age:
+                pool['messages'].popleft()
+            message = pool['messages'].popleft()[1] if pool['messages'] else None
+            if message is not None:
+                self.served_from_pool += 1
+        self._wake.set()
+        if message is not None:
+            return message, 'pool'
+
+        message = generate_text(model, self.render_prompt(config, key), model_parameters(config, model))
+        with self._lock:
+            self.served_live += 1
+        return message, 'live'
+
+    def seed(self, config):
+        """Register the placeholder-free phases for each language so they are warm before first use"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for language in self.languages:
+                for phase in ('preparing', 'finished'):
+                    self._pool_locked(self.resolve_key(config, phase, language))
+        self._wake.set()
+
+    def _next_refill(self):
+        """Pick the emptiest recently-requested pool that is below target and not backing off"""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, p in self._pools.items() if now - p['last_requested'] > self.max_age]:
+                del self._pools[key]
+            candidates = [(len(p['messages']), key) for key, p in self._pools.items()
+                          if len(p['messages']) < self.size and p['retry_at'] <= now]
+        return min(candidates)[1] if candidates else None
+
+    def _refill_failed(self, key):
+        """Back this pool off exponentially so the other pools still get filled"""
+        with self._lock:
+            self.failures += 1
+            pool = self._pools.get(key)
+            if pool is None:
+                return 0
+            pool['failures'] += 1
+            delay = min(MESSAGE_POOL_MAX_BACKOFF, self.refill_interval * 2 ** (pool['failures'] - 1))
+            pool['retry_at'] = time.time() + delay
+            return delay
+
+    def _refill_loop(self):
+        while True:
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+            while True:
+                if self.idle_only and request_coalescer.in_flight_count() > 0:
+                    break
+                key = self._next_refill()
+                if key is None:
+                    break
+                config = config_store.snapshot()[0] or {}
+                _, _, model, _, _ = key
+                try:
+                    message = generate_text(model, self.render_prompt(config, key), model_parameters(config, model),
+                                            priority='background')
+                except Exception as e:
+                    delay = self._refill_failed(key)
+                    print(f"Message pool refill failed for {key[:3]}: {e} (retrying in {delay:g}s)")
+                    continue
+                if not message:
+                    continue
+                with self._lock:
+                    pool = self._pools.get(key)
+                    if pool is not None:
+                        pool['messages'].append((time.time(), message))
+                        pool['failures'] = 0
+                        pool['retry_at'] = 0.0
+                    self.generated += 1
+
+    def start(self, config):
+        if not self.enabled or self._thread:
+            return
+        self.seed(config)
+        self._thread = threading.Thread(target=self._refill_loop, name='message-pool', daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            pools = [
+                {"phase": key[0], "language": key[1], "model": key[2], "distance": key[3], "gifts": key[4],
+                 "ready": len(pool['messages']), "failures": pool['failures']}
+                for key, pool in self._pools.items()
+            ]
+            return {
+                "enabled": self.enabled, "target_size": self.size, "pools": pools,
+                "served_from_pool": self.served_from_pool, "served_live": self.served_live,
+                "generated": self.generated, "failures": self.failures
+            }
+
+
+message_pool = SantaMessagePool()
+
+
+class NiceListService:
+    """Nice List checks with a server-side custom naughty list.
+
+    Names are indexed by a normalized form (NFKC, case-folded, whitespace
+    collapsed) so "Evan", " evan " and full-width or decomposed Hangul
+    spellings all match the same entry. Names on the custom naughty list are
+    answered instantly without calling the model. Model verdicts are cached
+    per name, language, model, options and prompt; the cached message keeps a
+    slot for the name so every caller sees their own spelling.
+    """
+
+    # Stands in for the name in cached messages and prompt hashes
+    NAME_SLOT = '\0'
+
+    def __init__(self, settings=None):
+        self._lock = threading.Lock()
+        self._naughty = {}
+        self._verdicts = OrderedDict()
+        self.short_circuits = 0
+        self.cache_hits = 0
+        self.model_calls = 0
+        self.configure(settings)
+
+    def configure(self, settings=None):
+        merged = dict(DEFAULT_NICE_LIST_SETTINGS)
+        merged.update(settings or {})
+        store_path = merged.get('storePath')
+        self.store_path = (BASE_DIR / store_path) if store_path else None
+        self.verdict_ttl = float(merged['verdictTtlSeconds'])
+        self.max_verdicts = max(1, int(merged['maxCachedVerdicts']))
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(unicodedata.normalize('NFKC', name or '').casefold().split())
+
+    def load(self):
+        if not self.store_path or not self.store_path.exists():
+            return
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Failed to load naughty list: {e}")
+            return
+        with self._lock:
+            self._naughty = {self.normalize(e['name']): e for e in entries if self.normalize(e.get('name'))}
+
+    def _save_locked(self):
+        if not self.store_path:
+            return
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.store_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self._naughty.values()), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.store_path)
+
+    def list_naughty(self):
+        with self._lock:
+            return sorted(self._naughty.values(), key=lambda e: e['addedAt'], reverse=True)
+
+    def add(self, name):
+        """Add a name (no-op if an equivalent name is already listed); returns the entry"""
+        if not isinstance(name, str):
+            raise ValueError("'name' must be a string")
+        key = self.normalize(name)
+        if not key:
+            raise ValueError("Name required")
+        with self._lock:
+            entry = self._naughty.get(key)
+            if entry is None:
+                entry = {"id": uuid.uuid4().hex[:12], "name": name.strip(),
+                         "addedAt": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+                self._naughty[key] = entry
+                self._save_locked()
+            return entry
+
+    def remove(self, name_or_id):
+        """Remove by id or by any spelling of the name"""
+        key = self.normalize(name_or_id)
+        with self._lock:
+            if key not in self._naughty:
+                key = next((k for k, e in self._naughty.items() if e['id'] == name_or_id), None)
+            if key is None:
+                return False
+            del self._naughty[key]
+            self._save_locked()
+            return True
+
+    def find_naughty(self, name):
+        """Return the matching naughty list entry, or None"""
+        with self._lock:
+            return self._naughty.get(self.normalize(name))
+
+    @staticmethod
+    def parse_verdict(text, name, language):
+        """Extract STATUS/MESSAGE lines from the model reply"""
+        status = 'NICE'
+        message = NICE_LIST_MESSAGES[language]['nice'].format(name=name)
+        for line in text.split('\n'):
+            line = line.strip()
+            status_match = re.match(r'STATUS:\s*(NICE|NAUGHTY)', line, re.IGNORECASE)
+            if status_match:
+                status = status_match.group(1).upper()
+            message_match = re.match(r'MESSAGE:\s*(.+)', line, re.IGNORECASE)
+            if message_match:
+                message = message_match.group(1).strip()
+        return status, message
+
+    @staticmethod
+    def verdict_key(name, language, prompt, model, options):
+        """Cache key for a model verdict; the caller's spelling of the name is masked in the prompt"""
+        if prompt:
+            prompt = re.sub(re.escape(name), NiceListService.NAME_SLOT, prompt, flags=re.IGNORECASE)
+        material = [prompt or '', model, options]
+        digest = hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return (NiceListService.normalize(name), language, digest.hexdigest())
+
+    def check(self, config, name, language='en', prompt=None, model=None, options=None):
+        """Return the verdict for ``name``, calling the model only when necessary"""
+        if name is not None and not isinstance(name, str):
+            raise ValueError("'name' must be a string")
+        if (prompt is not None and not isinstance(prompt, str)) or (model is not None and not isinstance(model, str)):
+            raise ValueError("'prompt' and 'model' must be strings")
+        if options is not None and not isinstance(options, dict):
+            raise ValueError("'options' must be an object")
+        name = (name or '').strip()
+        if not name:
+            raise ValueError("Name required")
+        language = 'ko' if language == 'ko' else 'en'
+
+        if self.find_naughty(name) is not None:
+            with self._lock:
+                self.short_circuits += 1
+            return {"name": name, "status": "NAUGHTY", "isCustom": True, "source": "naughty-list",
+                    "message": NICE_LIST_MESSAGES[language]['custom'].format(name=name)}
+
+        model = model or config.get('aiProvider', {}).get('defaultModel', '')
+        options = options or {'temperature': 0.9, 'num_predict': 100}
+        cache_key = self.verdict_key(name, language, prompt, model, options)
+        now = time.time()
+        with self._lock:
+            cached = self._verdicts.get(cache_key)
+            if cached is not None and now - cached['checked_at'] <= self.verdict_ttl:
+                self._verdicts.move_to_end(cache_key)
+                self.cache_hits += 1
+                return {"name": name, "status": cached['status'], "isCustom": False, "source": "cache",
+                        "message": cached['message'].replace(self.NAME_SLOT, name)}
+
+        generation_options = model_parameters(config, model)
+        generation_options.update(options)
+        text = generate_text(model, prompt or NICE_LIST_PROMPTS[language].format(name=name), generation_options)
+        status, message = self.parse_verdict(text, name, language)
+
+        with self._lock:
+            self.model_calls += 1
+            # Store the message with the name masked out so later callers get their own spelling
+            self._verdicts[cache_key] = {"status": status, "checked_at": now,
+                                         "message": re.sub(re.escape(name), self.NAME_SLOT, message,
+                                                           flags=re.IGNORECASE)}
+            self._verdicts.move_to_end(cache_key)
+            while len(self._verdicts) > self.max_verdicts:
+                self._verdicts.popitem(last=False)
+        return {"name": name, "status": status, "message": message, "isCustom": False, "source": "model"}
+
+    def stats(self):
+        with self._lock:
+            return {"naughty_names": len(self._naughty), "cached_verdicts": len(self._verdicts),
+                    "short_circuits": self.short_circuits, "cache_hits": self.cache_hits,
+                    "model_calls": self.model_calls}
+
+
+nice_list = NiceListService()
+
 
 class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
+    # Socket timeout for client reads and writes (overridable under "server.clientTimeoutSeconds")
+    timeout = DEFAULT_CLIENT_TIMEOUT
+
+    def handle_one_request(self):
+        """Time each request on the connection and record it once it has been answered"""
+        self.response_status = None
+        started = time.monotonic()
+        try:
+            super().handle_one_request()
+        finally:
+            if self.response_status is not None:
+                metrics.record_request(self.command or '-', self.path, self.response_status,
+                                       time.monotonic() - started)
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
     def end_headers(self):
         # Add CORS headers for all requests
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Priority, X-Deadline-Seconds')
         super().end_headers()
 
     def do_OPTIONS(self):
@@ -40,11 +3211,31 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             self.handle_models_get()
         elif self.path.startswith('/api/ollama'):
             self.handle_ollama_get()
+        elif self.path.startswith('/api/cache'):
+            self.handle_cache_get()
+        elif self.path.startswith('/api/messages'):
+            self.handle_messages_get()
+        elif self.path.startswith('/api/nicelist'):
+            self.handle_nicelist_get()
+        elif self.path.startswith('/api/metrics'):
+            self.handle_metrics_get()
         else:
             # Serve static files - redirect root to main app
             if self.path == '/':
                 self.path = '/santa-tracker.html'
-            super().do_GET()
+            if self.is_private_path():
+                self.send_error(404)
+            elif not self.serve_static_asset():
+                super().do_GET()
+
+    def do_HEAD(self):
+        """Handle HEAD requests for static files"""
+        if self.path == '/':
+            self.path = '/santa-tracker.html'
+        if self.is_private_path():
+            self.send_error(404)
+        elif not self.serve_static_asset(head_only=True):
+            super().do_HEAD()
 
     def do_POST(self):
         """Handle POST requests - API endpoints and Ollama proxy"""
@@ -52,6 +3243,10 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             self.handle_config_post()
         elif self.path.startswith('/api/models'):
             self.handle_models_post()
+        elif self.path == '/api/generate/batch':
+            self.handle_batch_generate()
+        elif self.path.startswith('/api/nicelist'):
+            self.handle_nicelist_post()
         elif self.path.startswith('/api/'):
             # Proxy all other API requests to Ollama
             self.proxy_ollama_request()
@@ -69,23 +3264,80 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
         """Handle DELETE requests - Model management"""
         if self.path.startswith('/api/models'):
             self.handle_models_delete()
+        elif self.path.startswith('/api/nicelist/naughty/'):
+            self.handle_nicelist_delete()
+        elif self.path == '/api/cache':
+            generation_cache.clear()
+            self.send_json_response({"status": "success", "message": "Generation cache cleared"})
         else:
             self.send_error(404)
 
+    # Static Assets
+    def is_private_path(self):
+        """True for logs, caches and config JSON, which hold prompts and family details"""
+        try:
+            relative = Path(self.translate_path(self.path)).resolve().relative_to(BASE_DIR.resolve())
+        except ValueError:
+            return False
+        if not relative.parts:
+            return False
+        # Lower-cased so /LOGS/ doesn't slip through on case-insensitive filesystems
+        top, suffix = relative.parts[0].lower(), relative.suffix.lower()
+        return top in PRIVATE_STATIC_DIRS or (top == 'config' and suffix == '.json')
+
+    def serve_static_asset(self, head_only=False):
+        """Serve a file from the in-memory asset cache; returns False to fall back to disk"""
+        asset = static_cache.get(self.translate_path(self.path))
+        if asset is None:
+            return False
+
+        encoding, body, etag = asset.choose(self.headers.get('Accept-Encoding'))
+        if self.headers.get('If-None-Match'):
+            not_modified = any(self.etag_matches(tag) for tag in asset.etags())
+        else:
+            not_modified = self.headers.get('If-Modified-Since') == asset.last_modified
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', asset.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if not not_modified:
+            self.send_header('Content-Type', asset.content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if encoding != 'identity':
+                self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if not not_modified and not head_only:
+            self.wfile.write(body)
+        return True
+
     # Configuration Management
     def handle_config_get(self):
-        """Handle configuration GET requests"""
+        """Handle configuration GET requests (ETag / If-None-Match aware)"""
         try:
             if self.path == '/api/config':
-                config = self.load_config()
-                self.send_json_response(config)
+                section = None
             elif self.path.startswith('/api/config/'):
                 section = self.path.split('/')[-1]
-                config = self.load_config()
-                if section in config:
-                    self.send_json_response(config[section])
-                else:
-                    self.send_error(404, f"Config section '{section}' not found")
+            else:
+                self.send_error(400, "Invalid config endpoint")
+                return
+
+            version = config_store.current_version()
+            etag = f'"{version}-{section}"' if version and section else (f'"{version}"' if version else None)
+            if etag and self.etag_matches(etag):
+                self.send_not_modified(etag)
+                return
+
+            config = self.load_config()
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'} if etag else None
+            if section is None:
+                self.send_json_response(config, headers=headers)
+            elif section in config:
+                self.send_json_response(config[section], headers=headers)
+            else:
+                self.send_error(404, f"Config section '{section}' not found")
         except Exception as e:
             self.send_error(500, f"Config error: {str(e)}")
 
@@ -123,9 +3375,7 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             post_data = self.rfile.read(content_length)
             new_data = json.loads(post_data.decode('utf-8'))
 
-            config = self.load_config()
-            config[section] = new_data
-            self.save_config(config)
+            self.update_config(lambda config: config.__setitem__(section, new_data))
 
             self.send_json_response({"status": "success", "message": f"Updated {section}"})
         except Exception as e:
@@ -138,26 +3388,84 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             if self.path == '/api/models':
                 models = self.get_ollama_models()
                 self.send_json_response(models)
-            elif self.path == '/api/models/health':
-                health_status = self.check_model_health()
+            elif self.path.split('?')[0] == '/api/models/health':
+                query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+                health_status = self.check_model_health(query)
                 self.send_json_response(health_status)
+            elif self.path.startswith('/api/models/pull'):
+                self.handle_pull_get()
+            elif self.path == '/api/models/catalog':
+                self.send_json_response(model_catalog.status())
             elif self.path == '/api/models/current':
                 config = self.load_config()
                 current_model = config.get('aiProvider', {}).get('defaultModel', '')
-                self.send_json_response({"current_model": current_model})
+                self.send_json_response({
+                    "current_model": current_model,
+                    "warmup": model_warmer.state(ModelCatalog.normalize(current_model))
+                })
+            elif self.path == '/api/models/warmup':
+                self.send_json_response(model_warmer.status())
             else:
                 self.send_error(400, "Invalid models endpoint")
         except Exception as e:
             self.send_error(500, f"Models error: {str(e)}")
 
+    def handle_pull_get(self):
+        """Handle pull job listing, status and progress streaming"""
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = [p for p in parsed.path.split('/') if p][3:]
+        if not parts:
+            self.send_json_response(pull_manager.list())
+            return
+
+        job = pull_manager.get(parts[0])
+        if job is None:
+            self.send_error(404, f"Pull job '{parts[0]}' not found")
+        elif len(parts) == 1:
+            self.send_json_response(job)
+        elif parts[1] == 'events':
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            self.stream_pull_progress(parts[0], query.get('format', 'sse'))
+        else:
+            self.send_error(400, "Invalid pull endpoint")
+
+    def stream_pull_progress(self, job_id, fmt):
+        """Stream job updates as Server-Sent Events (default) or NDJSON until the pull finishes"""
+        sse = fmt != 'ndjson'
+        self.start_stream_response('text/event-stream' if sse else 'application/x-ndjson')
+        version = None
+        try:
+            while True:
+                snapshot, new_version = pull_manager.wait_for_update(job_id, version, timeout=15)
+                if snapshot is None:
+                    break
+                if new_version == version:
+                    # No progress in a while; keep the connection alive
+                    self.write_stream_chunk(b": keep-alive\n\n" if sse else b"")
+                    continue
+                version = new_version
+                payload = json.dumps(snapshot)
+                event = 'done' if snapshot['state'] in ('success', 'error') else 'progress'
+                if sse:
+                    self.write_stream_chunk(f"event: {event}\ndata: {payload}\n\n".encode('utf-8'))
+                else:
+                    self.write_stream_chunk(f"{payload}\n".encode('utf-8'))
+                if event == 'done':
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        self.end_stream_response()
+
     def handle_models_post(self):
         """Handle model management POST requests"""
         try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            content_length = int(self.headers.get('Content-Length', 0))
+            post_data = self.rfile.read(content_length) if content_length > 0 else b''
+            data = json.loads(post_data.decode('utf-8')) if post_data else {}
 
-            if self.path == '/api/models/switch':
+            parsed = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            if parsed.path == '/api/models/switch':
                 model_name = data.get('model')
                 if not model_name:
                     self.send_error(400, "Model name required")
@@ -167,25 +3475,56 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
                     self.send_error(404, f"Model '{model_name}' not found")
                     return
 
-                config = self.load_config()
-                config['aiProvider']['defaultModel'] = model_name
-                self.save_config(config)
+                self.update_config(
+                    lambda config: config.setdefault('aiProvider', {}).__setitem__('defaultModel', model_name)
+                )
 
+                # ?wait=1 holds the response until the new model is loaded
+                normalized = ModelCatalog.normalize(model_name)
+                if query.get('wait') in ('1', 'true'):
+                    warmup = model_warmer.wait(normalized)
+                else:
+                    warmup = model_warmer.state(normalized)
                 self.send_json_response({
                     "status": "success",
-                    "message": f"Switched to model '{model_name}'"
+                    "message": f"Switched to model '{model_name}'",
+                    "warm": warmup.get('state') == 'warm',
+                    "warmup": warmup
                 })
 
-            elif self.path == '/api/models/pull':
+            elif parsed.path == '/api/models/warmup':
+                model_name = ModelCatalog.normalize(data.get('model') or model_warmer.active_model or '')
+                if not model_name:
+                    self.send_error(400, "Model name required")
+                    return
+                model_warmer.warm(model_name)
+                if query.get('wait') in ('1', 'true'):
+                    warmup = model_warmer.wait(model_name)
+                else:
+                    warmup = model_warmer.state(model_name)
+                self.send_json_response({"model": model_name, "warm": warmup.get('state') == 'warm', "warmup": warmup})
+
+            elif parsed.path == '/api/models/unload':
+                model_name = data.get('model')
+                if not model_name:
+                    self.send_error(400, "Model name required")
+                    return
+                model_warmer.unload(ModelCatalog.normalize(model_name))
+                self.send_json_response({"status": "success", "message": f"Unloaded model '{model_name}'"})
+
+            elif parsed.path == '/api/models/pull':
                 model_name = data.get('model')
                 if not model_name:
                     self.send_error(400, "Model name required")
                     return
 
-                threading.Thread(target=self.pull_model_async, args=(model_name,)).start()
+                job, created = pull_manager.start_pull(model_name)
                 self.send_json_response({
-                    "status": "started",
-                    "message": f"Started pulling model '{model_name}'"
+                    "status": "started" if created else "already_running",
+                    "message": (f"Started pulling model '{model_name}'" if created
+                                else f"Model '{model_name}' is already being pulled"),
+                    "job_id": job.id,
+                    "progress_url": f"/api/models/pull/{job.id}/events"
                 })
             else:
                 self.send_error(400, "Invalid models endpoint")
@@ -220,52 +3559,277 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             if self.path == '/api/ollama/status':
                 status = self.get_ollama_status()
                 self.send_json_response(status)
+            elif self.path == '/api/ollama/queue':
+                self.send_json_response(admission.stats())
             else:
                 self.send_error(400, "Invalid Ollama endpoint")
         except Exception as e:
             self.send_error(500, f"Ollama error: {str(e)}")
 
+    # Santa Message Pool
+    def handle_messages_get(self):
+        """Handle pre-generated Santa message requests"""
+        try:
+            parsed = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            if parsed.path == '/api/messages/pool':
+                self.send_json_response(message_pool.stats())
+            elif parsed.path == '/api/messages/santa':
+                config = self.load_config()
+                distance = float(query['distance']) if query.get('distance') else None
+                gifts = float(query['gifts']) if query.get('gifts') else None
+                key = message_pool.resolve_key(config, query.get('phase', 'preparing'), query.get('lang', 'en'),
+                                               query.get('model'), distance, gifts)
+                message, source = message_pool.take(config, key)
+                self.send_json_response({
+                    "message": message, "source": source, "phase": key[0], "language": key[1],
+                    "model": key[2], "distance_bucket": key[3], "gifts_bucket": key[4]
+                })
+            else:
+                self.send_error(400, "Invalid messages endpoint")
+        except ValueError as e:
+            self.send_error(400, str(e))
+        except AdmissionRejected as e:
+            self.send_busy_response(e)
+        except (urllib.error.HTTPError, urllib.error.URLError) as e:
+            self.send_json_response({
+                "error": f"Ollama not available: {str(e)}",
+                "suggestion": "Make sure Ollama is running with 'ollama serve'"
+            }, status=502)
+        except Exception as e:
+            self.send_error(500, f"Message error: {str(e)}")
+
+    # Nice List
+    def handle_nicelist_get(self):
+        """Handle naughty list and Nice List stats requests"""
+        if self.path == '/api/nicelist/naughty':
+            self.send_json_response(nice_list.list_naughty())
+        elif self.path == '/api/nicelist/stats':
+            self.send_json_response(nice_list.stats())
+        else:
+            self.send_error(400, "Invalid Nice List endpoint")
+
+    def handle_nicelist_post(self):
+        """Handle Nice List checks and naughty list additions"""
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(content_length).decode('utf-8')) if content_length else {}
+            if not isinstance(data, dict):
+                raise ValueError("Request body must be a JSON object")
+
+            if self.path == '/api/nicelist/check':
+                result = nice_list.check(
+                    self.load_config(), data.get('name'), data.get('language', 'en'),
+                    prompt=data.get('prompt'), model=data.get('model'), options=data.get('options')
+                )
+                self.send_json_response(result)
+            elif self.path == '/api/nicelist/naughty':
+                entry = nice_list.add(data.get('name'))
+                self.send_json_response({"status": "success", "entry": entry})
+            else:
+                self.send_error(400, "Invalid Nice List endpoint")
+        except json.JSONDecodeError:
+            self.send_error(400, "Invalid JSON")
+        except ValueError as e:
+            self.send_error(400, str(e))
+        except AdmissionRejected as e:
+            self.send_busy_response(e)
+        except (urllib.error.HTTPError, urllib.error.URLError) as e:
+            self.send_json_response({
+                "error": f"Ollama not available: {str(e)}",
+                "suggestion": "Make sure Ollama is running with 'ollama serve'"
+            }, status=502)
+        except Exception as e:
+            self.send_error(500, f"Nice List error: {str(e)}")
+
+    def handle_nicelist_delete(self):
+        """Remove a name (or entry id) from the naughty list"""
+        name = urllib.parse.unquote(self.path[len('/api/nicelist/naughty/'):])
+        if nice_list.remove(name):
+            self.send_json_response({"status": "success", "message": f"Removed '{name}'"})
+        else:
+            self.send_error(404, f"'{name}' is not on the naughty list")
+
+    # Batch Generation
+    def handle_batch_generate(self):
+        """Generate a batch of prompts concurrently, streaming NDJSON results as each completes"""
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(content_length).decode('utf-8')) if content_length else {}
+            config = self.load_config()
+            items = self.build_batch_items(data, config)
+            batch_config = dict(DEFAULT_BATCH_SETTINGS)
+            batch_config.update(config.get('batch', {}))
+            try:
+                max_parallel = max(1, min(int(data.get('maxParallel', batch_config['maxParallel'])),
+                                          int(batch_config['maxParallel'])))
+            except (TypeError, ValueError):
+                raise ValueError("'maxParallel' must be a number")
+        except (ValueError, FileNotFoundError) as e:
+            self.send_json_response({"error": str(e)}, status=400)
+            return
+        except Exception as e:
+            self.send_error(500, f"Batch error: {str(e)}")
+            return
+
+        if admission.enabled:
+            # Batch items are background work; workers beyond the background slots would only queue
+            max_parallel = min(max_parallel, sum(admission.background_slots(model)
+                                                 for model in {item['model'] for item in items}))
+
+        def generate(item):
+            started = time.monotonic()
+            message = generate_text(item['model'], item['prompt'], item['options'], priority='background')
+            return message, round((time.monotonic() - started) * 1000, 1)
+
+        batch_started = time.monotonic()
+        failed = 0
+        self.start_stream_response('application/x-ndjson')
+        try:
+            for item, result, error in run_bounded(generate, items, max_parallel):
+                line = {"index": item['index'], "id": item['id'], "model": item['model']}
+                if error is not None:
+                    failed += 1
+                    line["error"] = str(error)
+                else:
+                    line["message"], line["elapsed_ms"] = result
+                self.write_stream_chunk((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+            summary = {
+                "done": True, "count": len(items), "failed": failed, "max_parallel": max_parallel,
+                "elapsed_ms": round((time.monotonic() - batch_started) * 1000, 1)
+            }
+            self.write_stream_chunk((json.dumps(summary) + '\n').encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        self.end_stream_response()
+
+    def build_batch_items(self, data, config):
+        """Turn a batch request (family file or prompt list) into generation items"""
+        language = data.get('language', 'en')
+        default_model = data.get('model') or config.get('aiProvider', {}).get('defaultModel', '')
+        base_options = data.get('options') or {}
+
+        if data.get('familyFile'):
+            family_data = load_family_file(data['familyFile'])
+            members = family_data.get('family', {}).get('members', [])
+            entries = [{"id": m.get('name', str(i)), "prompt": render_member_prompt(family_data, m, language)}
+                       for i, m in enumerate(members)]
+        elif isinstance(data.get('prompts'), list):
+            entries = [p if isinstance(p, dict) else {"prompt": p} for p in data['prompts']]
+        else:
+            raise ValueError("Provide either 'familyFile' or a 'prompts' list")
+
+        max_items = int(config.get('batch', {}).get('maxItems', DEFAULT_BATCH_SETTINGS['maxItems']))
+        if not entries:
+            raise ValueError("Batch is empty")
+        if len(entries) > max_items:
+            raise ValueError(f"Batch has {len(entries)} items; the limit is {max_items}")
+
+        items = []
+        for index, entry in enumerate(entries):
+            if not entry.get('prompt'):
+                raise ValueError(f"Batch item {index} has no prompt")
+            model = entry.get('model') or default_model
+            options = model_parameters(config, model)
+            options.update(base_options)
+            options.update(entry.get('options') or {})
+            items.append({"index": index, "id": entry.get('id', index), "model": model,
+                          "prompt": entry['prompt'], "options": options})
+        return items
+
+    # Generation Cache
+    def handle_cache_get(self):
+        """Handle generation cache statistics requests"""
+        if self.path == '/api/cache':
+            stats = generation_cache.stats()
+            stats['coalescing'] = request_coalescer.stats()
+            self.send_json_response(stats)
+        else:
+            self.send_error(400, "Invalid cache endpoint")
+
+    def handle_metrics_get(self):
+        """Serve metrics as Prometheus text, or JSON with ?format=json"""
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path != '/api/metrics':
+            self.send_error(400, "Invalid metrics endpoint")
+            return
+        query = urllib.parse.parse_qs(parsed.query)
+        if query.get('format', [''])[0] == 'json':
+            self.send_json_response(metrics.snapshot(self.server))
+            return
+        body = metrics.render_prometheus(self.server).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
     def proxy_ollama_request(self):
-        """Proxy requests to Ollama API"""
+        """Proxy requests to Ollama API, relaying NDJSON chunks live when the client asks to stream"""
+        started = time.monotonic()
+        self.log_record = None
         try:
             content_length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(content_length) if content_length > 0 else b''
 
-            # Add debugging for API requests
-            if self.path == '/api/generate' and post_data:
-                try:
-                    request_json = json.loads(post_data.decode('utf-8'))
-                    print(f"\n🚀 AI Request to {request_json.get('model', 'unknown')}:")
-                    print(f"📝 Prompt: {request_json.get('prompt', 'empty')[:200]}...")
-                    print(f"⚙️ Options: {request_json.get('options', {})}")
-                except:
-                    print(f"🚀 AI Request (raw): {post_data[:200]}...")
-
-            req = urllib.request.Request(
-                f"{OLLAMA_URL}{self.path}",
-                data=post_data,
-                headers={'Content-Type': 'application/json'}
-            )
-
-            with urllib.request.urlopen(req, timeout=120) as response:
-                response_data = response.read()
+            try:
+                request_json = json.loads(post_data.decode('utf-8')) if post_data else None
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                request_json = None
+            streaming = isinstance(request_json, dict) and request_json.get('stream') is True
+            model = request_json.get('model') if isinstance(request_json, dict) else None
 
-                # Add debugging for AI responses
-                if self.path == '/api/generate':
-                    try:
-                        response_json = json.loads(response_data.decode('utf-8'))
-                        ai_response = response_json.get('response', '')
-                        print(f"🤖 AI Response ({len(ai_response)} chars): {ai_response[:100]}...")
-                        print(f"✅ Done: {response_json.get('done', False)}\n")
-                    except:
-                        print(f"🤖 AI Response (raw): {response_data[:200]}...\n")
-
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(response_data)
+            # Keep the active model resident unless the client manages keep_alive itself
+            if model and self.path in ('/api/generate', '/api/chat') and 'keep_alive' not in request_json:
+                keep_alive = model_warmer.keep_alive_for(model)
+                if keep_alive is not None:
+                    request_json['keep_alive'] = keep_alive
+                    post_data = json.dumps(request_json).encode('utf-8')
+
+            self.start_request_record(request_json, post_data)
+
+            cache_key, cache_target = (None, 0)
+            if self.path == '/api/generate':
+                cache_key, cache_target = generation_cache.make_key(request_json)
+            if cache_key:
+                cached = generation_cache.get(cache_key)
+                if cached is not None:
+                    self.log_record['cache'] = 'HIT'
+                    self.send_proxy_response(cached, cache_status='HIT')
+                    return
+
+            flight_key = request_coalescer.make_key(request_json) if self.path == '/api/generate' else None
+            if not flight_key:
+                self.forward_to_ollama(post_data, streaming, cache_key, cache_target, model=model)
+                return
+
+            flight, is_leader = request_coalescer.join(flight_key)
+            if not is_leader:
+                self.log_record['coalesced'] = True
+                self.relay_flight(flight, streaming, cache_status='MISS' if cache_key else None)
+                return
+
+            error = None
+            try:
+                self.forward_to_ollama(post_data, streaming, cache_key, cache_target, flight, model=model)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                request_coalescer.complete(flight_key, flight, error)
 
+        except AdmissionRejected as e:
+            self.note_request_error(str(e))
+            self.send_busy_response(e)
+        except UpstreamTimeout as e:
+            self.note_request_error(str(e))
+            self.send_json_response({
+                "error": f"Ollama did not answer in time: {e.reason}",
+                "suggestion": "The model is busy or slow; retry later or raise aiProvider.connectionPool.timeouts.generate"
+            }, status=504)
         except urllib.error.HTTPError as e:
+            self.note_request_error(f"HTTP {e.code}: {e.reason}")
             error_msg = json.dumps({
                 "error": f"Ollama HTTP error: {e.reason}",
                 "suggestion": "Make sure Ollama is properly installed and the model is available"
@@ -275,6 +3839,7 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(error_msg.encode())
         except urllib.error.URLError as e:
+            self.note_request_error(str(e))
             error_msg = json.dumps({
                 "error": f"Ollama not available: {str(e)}",
                 "suggestion": "Make sure Ollama is running with 'ollama serve'"
@@ -284,31 +3849,282 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(error_msg.encode())
         except Exception as e:
+            self.note_request_error(str(e))
             self.send_error(500, f"Proxy error: {str(e)}")
+        finally:
+            self.finish_request_record(started)
 
-    # Configuration Management
-    def load_config(self):
-        """Load configuration from file"""
+    def forward_to_ollama(self, post_data, streaming, cache_key=None, cache_target=0, flight=None, model=None):
+        """Wait for a model slot (generate/chat only), then send the request upstream"""
+        track = model is not None and self.path in ('/api/generate', '/api/chat')
+        with contextlib.ExitStack() as stack:
+            if track:
+                priority = AdmissionController.resolve_priority(self.headers.get('X-Priority'))
+                deadline = None
+                try:
+                    if self.headers.get('X-Deadline-Seconds'):
+                        deadline = admission.deadline_after(self.headers['X-Deadline-Seconds'])
+                except ValueError:
+                    pass
+                waited = stack.enter_context(admission.admit(model, priority, deadline))
+                if self.log_record is not None:
+                    self.log_record['priority'] = priority
+                    self.log_record['queue_wait_ms'] = round(waited * 1000, 1)
+            self.send_to_ollama(post_data, streaming, cache_key, cache_target, flight, model, track)
+
+    def send_to_ollama(self, post_data, streaming, cache_key, cache_target, flight, model, track):
+        """Make the upstream call (after admission) and relay the reply"""
+        started = time.monotonic()
+        recorded = False
+        try:
+            with ollama_backends.request('POST', self.path, body=post_data, timeout='generate', model=model) as response:
+                if self.log_record is not None:
+                    self.log_record['backend'] = response.backend
+                if streaming:
+                    final = self.relay_ollama_stream(response, flight)
+                    if track:
+                        recorded = True
+                        metrics.record_generation(model, time.monotonic() - started, final, error=final is None)
+                    return
+
+                response_data = response.read()
+                if flight is not None:
+                    flight.publish(response_data)
+
+                if track:
+                    response_json, text = self.parse_buffered_reply(response_data)
+                    recorded = True
+                    metrics.record_generation(model, time.monotonic() - started, response_json,
+                                              error=response_json is None)
+                    if response_json is not None:
+                        self.note_ollama_result(text, len(text), response_json)
+                        if cache_key and response_json.get('done'):
+                            generation_cache.put(cache_key, response_data, cache_target)
+                    else:
+                        text = response_data.decode('utf-8', 'replace')
+                        self.note_ollama_result(text, len(text), None)
+
+                self.send_proxy_response(response_data, cache_status='MISS' if cache_key else None)
+        except (urllib.error.URLError, OSError):
+            if track and not recorded:
+                metrics.record_generation(model, time.monotonic() - started, error=True)
+            raise
+
+    def relay_flight(self, flight, streaming, cache_status=None):
+        """Answer a coalesced request from the leader's upstream reply"""
+        # The leader may queue for a slot before its upstream call even starts
+        timeout = admission.max_wait() + ollama_backends.resolve_timeout('generate')
         try:
-            if CONFIG_FILE.exists():
-                with open(CONFIG_FILE, 'r') as f:
-                    return json.load(f)
+            if not streaming:
+                response_data = flight.result(timeout)
             else:
-                return self.get_default_config()
+                flight.wait_started(timeout)
+        except TimeoutError as e:
+            raise UpstreamTimeout(e)
+        if not streaming:
+            self.send_proxy_response(response_data, cache_status=cache_status)
+            return
+
+        self.start_stream_response('application/x-ndjson')
+        try:
+            for chunk in flight.iter_chunks(timeout):
+                self.write_stream_chunk(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            return
         except Exception as e:
-            print(f"Failed to load config: {e}")
-            return self.get_default_config()
+            error_line = json.dumps({"error": f"Stream interrupted: {str(e)}", "done": True}) + '\n'
+            try:
+                self.write_stream_chunk(error_line.encode('utf-8'))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+        self.end_stream_response()
+
+    def send_proxy_response(self, response_data, cache_status=None):
+        """Send a buffered Ollama reply to the client"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response_data)))
+        if cache_status:
+            self.send_header('X-Cache', cache_status)
+        self.end_headers()
+        self.wfile.write(response_data)
+
+    def relay_ollama_stream(self, response, flight=None):
+        """Forward Ollama's NDJSON stream to the client line by line as it arrives.
+
+        If other clients are coalesced onto this request, upstream is drained to
+        the end even when this client disconnects so they still get every line.
+        Returns the final ``done`` chunk (with Ollama's timing stats), or None
+        if the stream did not complete.
+        """
+        preview = ''
+        preview_limit = request_log.max_text_chars + 1
+        response_chars = 0
+        final = None
+        client_gone = False
+
+        self.start_stream_response('application/x-ndjson')
+        try:
+            for line in response:
+                if not line.strip():
+                    continue
+                if self.path in ('/api/generate', '/api/chat'):
+                    try:
+                        chunk = json.loads(line.decode('utf-8'))
+                        if chunk.get('done') and 'error' not in chunk:
+                            final = chunk
+                        token = self.response_text(chunk)
+                        response_chars += len(token)
+                        if len(preview) < preview_limit:
+                            preview += token
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        pass
+                if flight is not None:
+                    flight.publish(line)
+                if client_gone:
+                    continue
+                try:
+                    self.write_stream_chunk(line)
+                except (BrokenPipeError, ConnectionResetError):
+                    if self.log_record is not None:
+                        self.log_record['client_disconnected'] = True
+                    client_gone = True
+                    if flight is None:
+                        return final
+        except Exception as e:
+            # Headers are already out, so report the failure as a final NDJSON line
+            error_line = (json.dumps({"error": f"Stream interrupted: {str(e)}", "done": True}) + '\n').encode('utf-8')
+            self.note_request_error(f"Stream interrupted: {str(e)}")
+            if flight is not None:
+                flight.publish(error_line)
+            if client_gone:
+                return final
+            try:
+                self.write_stream_chunk(error_line)
+            except (BrokenPipeError, ConnectionResetError):
+                return final
+
+        self.note_ollama_result(preview, response_chars, final)
+        if client_gone:
+            return final
+        self.end_stream_response()
+        return final
+
+    @staticmethod
+    def response_text(chunk):
+        """Generated text of a generate or chat reply (or one streamed chunk of it)"""
+        if not isinstance(chunk, dict):
+            return ''
+        if 'response' in chunk:
+            return str(chunk.get('response') or '')
+        message = chunk.get('message')
+        return str(message.get('content') or '') if isinstance(message, dict) else ''
+
+    @classmethod
+    def parse_buffered_reply(cls, response_data):
+        """(final JSON object, generated text) of a buffered reply, or (None, None).
+
+        Ollama streams unless the request says ``"stream": false``, so a relayed
+        reply may be NDJSON; its stats are then on the last (done) line.
+        """
+        try:
+            text = response_data.decode('utf-8')
+            try:
+                chunks = [json.loads(text)]
+            except json.JSONDecodeError:
+                chunks = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None, None
+        if not chunks or not all(isinstance(chunk, dict) for chunk in chunks):
+            return None, None
+        return chunks[-1], ''.join(cls.response_text(chunk) for chunk in chunks)
+
+    def start_request_record(self, request_json, post_data):
+        """Begin the request log record for a proxied call"""
+        self.log_text = request_log.include_text()
+        record = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()) + 'Z',
+            "id": uuid.uuid4().hex[:12],
+            "client": self.client_address[0],
+            "method": self.command,
+            "path": self.path,
+            "request_bytes": len(post_data)
+        }
+        if isinstance(request_json, dict):
+            record["model"] = request_json.get('model')
+            record["stream"] = request_json.get('stream') is True
+            if request_json.get('options'):
+                record["options"] = request_json.get('options')
+            prompt = request_json.get('prompt')
+            if prompt is None and isinstance(request_json.get('messages'), list):
+                prompt = '\n'.join(str(m.get('content', '')) for m in request_json['messages'] if isinstance(m, dict))
+            if prompt is not None:
+                record["prompt_chars"] = len(str(prompt))
+                if self.log_text:
+                    record["prompt"] = request_log.truncate(prompt)
+        self.log_record = record
+
+    def note_ollama_result(self, text, total_chars, result):
+        """Add the reply text and Ollama's token/timing stats to the request log record"""
+        record = self.log_record
+        if record is None:
+            return
+        record["response_chars"] = total_chars
+        if self.log_text:
+            record["response"] = request_log.truncate(text)
+        if not isinstance(result, dict):
+            return
+        record["done"] = bool(result.get('done'))
+        for field in ('prompt_eval_count', 'eval_count'):
+            if field in result:
+                record[field] = result[field]
+        for field in ('total_duration', 'load_duration', 'prompt_eval_duration', 'eval_duration'):
+            if result.get(field):
+                record[field.replace('_duration', '_ms')] = round(result[field] / 1e6, 1)
+        if result.get('eval_count') and result.get('eval_duration'):
+            record["tokens_per_second"] = round(result['eval_count'] / (result['eval_duration'] / 1e9), 2)
+
+    def note_request_error(self, message):
+        if self.log_record is not None:
+            self.log_record["error"] = message
+
+    def finish_request_record(self, started):
+        """Stamp status and duration and hand the record to the background writer"""
+        record = self.log_record
+        if record is None:
+            return
+        self.log_record = None
+        record["status"] = self.response_status
+        record["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        request_log.log(record)
+
+    # Configuration Management
+    def load_config(self):
+        """Load configuration (served from memory, reloaded when the file changes)"""
+        config, _ = config_store.snapshot()
+        return config if config is not None else self.get_default_config()
 
     def save_config(self, config):
-        """Save configuration to file"""
-        CONFIG_DIR.mkdir(exist_ok=True)
+        """Validate and atomically save configuration to file"""
+        self.check_config(config)
+        config_store.save(config)
+        model_warmer.follow_config(config)
+
+    def update_config(self, mutator):
+        """Apply ``mutator`` to the current configuration and save it atomically"""
+        def apply(config):
+            mutator(config)
+            self.check_config(config)
+        config = config_store.update(apply, self.get_default_config)
+        model_warmer.follow_config(config)
+        return config
+
+    def check_config(self, config):
+        """Raise ValueError if the configuration is invalid"""
         validation = self.validate_config(config)
         if not validation['valid']:
             raise ValueError(f"Invalid configuration: {validation['errors']}")
 
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-
     def validate_config(self, config):
         """Validate configuration structure"""
         errors = []
@@ -323,16 +4139,33 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
                 errors.append("Missing aiProvider.url")
             if 'defaultModel' not in provider:
                 errors.append("Missing aiProvider.defaultModel")
+            if provider.get('backends'):
+                try:
+                    OllamaBackendRouter.parse_backends(provider['backends'])
+                except (TypeError, ValueError) as e:
+                    errors.append(f"Invalid aiProvider.backends: {e}")
 
         return {'valid': len(errors) == 0, 'errors': errors}
 
-    def get_default_config(self):
+    @staticmethod
+    def get_default_config():
         """Return default configuration"""
         return {
             "aiProvider": {
                 "type": "ollama",
                 "url": "http://localhost:11434",
                 "defaultModel": "llama3.2",
+                "connectionPool": {
+                    "size": DEFAULT_POOL_SIZE,
+                    "idleTimeoutSeconds": DEFAULT_POOL_IDLE_TIMEOUT,
+                    "timeouts": dict(DEFAULT_OLLAMA_TIMEOUTS)
+                },
+                "modelCatalog": {"ttlSeconds": DEFAULT_CATALOG_TTL, "maxStaleSeconds": DEFAULT_CATALOG_MAX_STALE},
+                "healthChecks": dict(DEFAULT_HEALTH_SETTINGS),
+                "pulls": dict(DEFAULT_PULL_SETTINGS),
+                "warmup": dict(DEFAULT_WARMUP_SETTINGS),
+                "admission": copy.deepcopy(DEFAULT_ADMISSION_SETTINGS),
+                "circuitBreaker": dict(DEFAULT_CIRCUIT_BREAKER_SETTINGS),
                 "availableModels": [
                     {
                         "name": "llama3.2",
@@ -347,131 +4180,197 @@ class SantaTrackerHandler(http.server.SimpleHTTPRequestHandler):
                 "delivering": "You are Santa Claus! Write a cheerful, warm message (2-3 sentences max) to someone tracking your journey. Santa is currently delivering presents around the world! {{DISTANCE_CONTEXT}} {{GIFTS_CONTEXT}} Be jolly, mention the reindeer if relevant, and keep it magical and brief. Use emojis sparingly (1-2 max). Don't use quotation marks.",
                 "finished": "You are Santa Claus! Write a cheerful, warm message (2-3 sentences max) about finishing Christmas deliveries and resting at the North Pole with the reindeer. Be jolly and keep it magical and brief. Use emojis sparingly (1-2 max). Don't use quotation marks."
             },
-            "server": {"port": 8000, "corsEnabled": True},
+            "cache": dict(DEFAULT_CACHE_SETTINGS),
+            "messagePool": copy.deepcopy(DEFAULT_MESSAGE_POOL_SETTINGS),
+            "batch": dict(DEFAULT_BATCH_SETTINGS),
+            "niceList": dict(DEFAULT_NICE_LIST_SETTINGS),
+            "requestLog": dict(DEFAULT_REQUEST_LOG_SETTINGS),
+            "server": {
+                "port": 8000, "corsEnabled": True, "maxConcurrency": DEFAULT_MAX_CONCURRENCY,
+                "maxQueued": DEFAULT_MAX_QUEUED, "retryAfterSeconds": DEFAULT_RETRY_AFTER,
+                "drainTimeoutSeconds": DEFAULT_DRAIN_TIMEOUT,
+                "clientTimeoutSeconds": DEFAULT_CLIENT_TIMEOUT,
+                "staticCache": copy.deepcopy(DEFAULT_STATIC_SETTINGS)
+            },
             "ui": {"showConfigPanel": True, "allowModelSwitching": True, "allowPromptEditing": True},
             "features": {"modelValidation": True, "autoDiscoverModels": True, "configAutoSave": True}
         }
 
     # Ollama Integration Methods
     def get_ollama_models(self):
-        """Get available models from Ollama"""
-        try:
-            req = urllib.request.Request(f"{OLLAMA_URL}/api/tags")
-            with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
-                return data.get('models', [])
-        except Exception as e:
-            print(f"Failed to get Ollama models: {e}")
-            return []
+        """Get available models from Ollama (via the cached model catalog)"""
+        return model_catalog.models()
 
     def get_ollama_status(self):
         """Get Ollama service status"""
+        backends = ollama_backends.status()
         try:
-            req = urllib.request.Request(f"{OLLAMA_URL}/api/version")
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode('utf-8'))
-                return {"status": "running", "version": data.get("version", "unknown"), "url": OLLAMA_URL}
+            versions = ollama_backends.gather('GET', '/api/version', timeout='version')
         except Exception as e:
-            return {"status": "offline", "error": str(e), "url": OLLAMA_URL}
+            return {"status": "offline", "error": str(e), "url": ollama_backends.base_url, "backends": backends}
+        for backend in backends:
+            backend["version"] = versions.get(backend["name"], {}).get("version")
+        return {
+            "status": "running",
+            "version": next(iter(versions.values())).get("version", "unknown"),
+            "url": ollama_backends.base_url,
+            "backends": backends
+        }
 
     def validate_model_exists(self, model_name):
         """Check if model exists in Ollama"""
-        models = self.get_ollama_models()
-        return any(model['name'].split(':')[0] == model_name for model in models)
-
-    def pull_model_async(self, model_name):
-        """Pull model from Ollama registry (async)"""
-        try:
-            print(f"Starting pull for model: {model_name}")
-            req_data = json.dumps({"name": model_name}).encode('utf-8')
-            req = urllib.request.Request(f"{OLLAMA_URL}/api/pull", data=req_data, headers={'Content-Type': 'application/json'})
-
-            with urllib.request.urlopen(req, timeout=1800) as response:
-                while True:
-                    chunk = response.read(1024)
-                    if not chunk:
-                        break
-                    try:
-                        lines = chunk.decode('utf-8').strip().split('\n')
-                        for line in lines:
-                            if line:
-                                data = json.loads(line)
-                                if 'status' in data:
-                                    print(f"Pull progress: {data['status']}")
-                    except:
-                        pass
-            print(f"Successfully pulled model: {model_name}")
-        except Exception as e:
-            print(f"Failed to pull model {model_name}: {e}")
+        return model_catalog.find(model_name) is not None
 
     def delete_ollama_model(self, model_name):
         """Delete model from Ollama"""
         try:
-            req_data = json.dumps({"name": model_name}).encode('utf-8')
-            req = urllib.request.Request(f"{OLLAMA_URL}/api/delete", data=req_data, headers={'Content-Type': 'application/json'})
-            req.get_method = lambda: 'DELETE'
-
-            with urllib.request.urlopen(req, timeout=120) as response:
-                return response.status == 200
+            ollama_backends.gather('DELETE', '/api/delete', {"name": model_name}, timeout='delete', model=model_name)
+            model_catalog.invalidate()
+            return True
         except Exception as e:
             print(f"Failed to delete model {model_name}: {e}")
             return False
 
-    def check_model_health(self):
-        """Check health of all models"""
-        models = self.get_ollama_models()
-        health_status = []
+    def check_model_health(self, query=None):
+        """Return the latest health results, optionally starting (and waiting for) a fresh run"""
+        query = query or {}
+        if query.get('refresh') == '1' or health_monitor.last_run is None:
+            loaded_only = None if 'all' not in query else query['all'] != '1'
+            if query.get('wait') != '1':
+                health_monitor.trigger(loaded_only)
+            elif not health_monitor.run_checks(loaded_only):
+                rounds = -(-len(model_catalog.models()) // health_monitor.max_parallel)
+                health_monitor.wait_idle(rounds * ollama_backends.resolve_timeout('health') + 5)
+        return health_monitor.snapshot()
 
-        for model in models:
-            model_name = model['name'].split(':')[0]
-            try:
-                test_data = {"model": model_name, "prompt": "Test", "stream": False, "options": {"num_predict": 1}}
-                req = urllib.request.Request(f"{OLLAMA_URL}/api/generate", data=json.dumps(test_data).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    # Utility Methods
+    def start_stream_response(self, content_type):
+        """Begin a streamed 200 response (chunked on HTTP/1.1, close-delimited on HTTP/1.0)"""
+        self._chunked = self.request_version != 'HTTP/1.0'
+        if self._chunked:
+            self.protocol_version = 'HTTP/1.1'
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        if self._chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.flush()
 
-                with urllib.request.urlopen(req, timeout=10) as response:
-                    data = json.loads(response.read().decode('utf-8'))
-                    healthy = 'response' in data
+    def write_stream_chunk(self, data):
+        """Write and flush one piece of a streamed response"""
+        if not data:
+            return
+        if self._chunked:
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+        self.wfile.flush()
 
-                health_status.append({
-                    "name": model_name, "healthy": healthy, "size": model.get('size', 0),
-                    "modified_at": model.get('modified_at', ''), "last_checked": time.time()
-                })
-            except Exception as e:
-                health_status.append({"name": model_name, "healthy": False, "error": str(e), "last_checked": time.time()})
+    def end_stream_response(self):
+        """Terminate a streamed response"""
+        try:
+            if self._chunked:
+                self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
 
-        return health_status
+    def send_busy_response(self, error):
+        """503 for a generation shed by admission control"""
+        self.send_json_response({
+            "error": str(error),
+            "suggestion": f"The model is busy with other requests, retry in {error.retry_after}s"
+        }, status=503, headers={'Retry-After': str(error.retry_after)})
 
-    # Utility Methods
-    def send_json_response(self, data):
+    def send_json_response(self, data, status=200, headers=None):
         """Send JSON response with proper headers"""
         response_data = json.dumps(data).encode('utf-8')
-        self.send_response(200)
+        self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', str(len(response_data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(response_data)
 
+    def etag_matches(self, etag):
+        """True if the request's If-None-Match covers ``etag``"""
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        if header.strip() == '*':
+            return True
+        candidates = [tag.strip() for tag in header.split(',')]
+        return etag in candidates or f"W/{etag}" in candidates
+
+    def send_not_modified(self, etag):
+        """Send a 304 for a conditional request whose ETag still matches"""
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
     def log_message(self, format, *args):
         """Override to customize logging"""
-        if not self.path.startswith('/api/'):
+        # A connection that times out before sending a request line has no path yet
+        if not getattr(self, 'path', '').startswith('/api/'):
             super().log_message(format, *args)
 
 if __name__ == "__main__":
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    # Load port from configuration
-    try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                port = config.get('server', {}).get('port', PORT)
-        else:
-            port = PORT
-    except Exception as e:
-        print(f"Failed to load config for port: {e}")
-        port = PORT
+    # Load port, concurrency and connection pool settings from configuration
+    startup_config, _ = config_store.snapshot()
+    startup_config = startup_config or SantaTrackerHandler.get_default_config()
+    server_config = startup_config.get('server', {})
+    static_cache.configure(server_config.get('staticCache'))
+    provider_config = startup_config.get('aiProvider', {})
+    cache_config = startup_config.get('cache', {})
+    port = server_config.get('port', PORT)
+    pool_config = provider_config.get('connectionPool', {})
+    ollama_backends.configure(
+        backends=provider_config.get('backends') or [provider_config.get('url') or OLLAMA_URL],
+        size=pool_config.get('size', DEFAULT_POOL_SIZE),
+        idle_timeout=pool_config.get('idleTimeoutSeconds', DEFAULT_POOL_IDLE_TIMEOUT),
+        timeouts=pool_config.get('timeouts'),
+        breaker=provider_config.get('circuitBreaker')
+    )
+    catalog_config = provider_config.get('modelCatalog', {})
+    model_catalog.configure(
+        ttl=catalog_config.get('ttlSeconds', DEFAULT_CATALOG_TTL),
+        max_stale=catalog_config.get('maxStaleSeconds', DEFAULT_CATALOG_MAX_STALE)
+    )
+    # Read every backend's /api/tags up front so routing knows where each model lives
+    threading.Thread(target=model_catalog.refresh, name='catalog-refresh', daemon=True).start()
+    pull_manager.configure(provider_config.get('pulls'))
+    health_monitor.configure(provider_config.get('healthChecks'))
+    health_monitor.start()
+    admission.configure(provider_config.get('admission'))
+    model_warmer.configure(provider_config.get('warmup'))
+    model_warmer.start(startup_config)
+    nice_list.configure(startup_config.get('niceList'))
+    nice_list.load()
+    message_pool.configure(startup_config.get('messagePool'))
+    message_pool.start(startup_config)
+    generation_cache.configure(cache_config)
+    generation_cache.start_persistence()
+    request_log.configure(startup_config.get('requestLog'))
+    request_log.start()
+    drain_timeout = server_config.get('drainTimeoutSeconds', DEFAULT_DRAIN_TIMEOUT)
+    SantaTrackerHandler.timeout = max(1.0, float(server_config.get('clientTimeoutSeconds', DEFAULT_CLIENT_TIMEOUT)))
 
-    with socketserver.TCPServer(("", port), SantaTrackerHandler) as httpd:
+    with ConcurrentHTTPServer(
+        ("", port), SantaTrackerHandler,
+        max_concurrency=server_config.get('maxConcurrency', DEFAULT_MAX_CONCURRENCY),
+        max_queued=server_config.get('maxQueued', DEFAULT_MAX_QUEUED),
+        retry_after=server_config.get('retryAfterSeconds', DEFAULT_RETRY_AFTER)
+    ) as httpd:
+        # SIGTERM stops accepting connections the same way Ctrl+C does
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.shutdown).start())
         print(f"""
 ╔══════════════════════════════════════════════════════════════════╗
 ║                🎅 Santa Tracker Server - Unified 🎄             ║
@@ -483,7 +4382,11 @@ if __name__ == "__main__":
   ⚙️  Configuration API: http://localhost:{port}/api/config
   🤖 Model management: http://localhost:{port}/api/models
   🌐 Ollama status: http://localhost:{port}/api/ollama/status
+  ⚡ Generation cache: http://localhost:{port}/api/cache
+  📊 Metrics: http://localhost:{port}/api/metrics
 
+  ⚡ Concurrency: {httpd.max_concurrency} workers, {httpd.max_queued} queued
+  🦙 Ollama backends: {', '.join(f"{b['name']} ({b['url']})" for b in ollama_backends.status())}
   🛑 Press Ctrl+C to stop the server
 
   📝 Unified Features:
@@ -497,4 +4400,14 @@ if __name__ == "__main__":
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print("\n\n🎅 Ho ho ho! Server stopped. Merry Christmas! 🎄\n")
\ No newline at end of file
+            pass
+
+        in_flight = httpd.active_requests()
+        if in_flight:
+            print(f"\n⏳ Waiting up to {drain_timeout}s for {in_flight} request(s) to finish...")
+        if not httpd.drain(drain_timeout):
+            print(f"⚠️ Drain timed out with {httpd.active_requests()} request(s) still running")
+        ollama_backends.close()
+        generation_cache.save()
+        request_log.close()
+        print("\n\n🎅 Ho ho ho! Server stopped. Merry Christmas! 🎄\n")
\ No newline at end of file